@@ -0,0 +1,110 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage
+
+from aiz.agents.cascade import response_text
+
+
+@dataclass(frozen=True)
+class RunBudget:
+    """
+    Upper bounds for a single graph run. A limit of None means unlimited.
+    Limits are checked before every step that would cost another LLM call or
+    tool invocation, so a run stops within one step of exhausting its budget.
+    """
+    max_llm_calls: Optional[int] = None
+    max_input_tokens: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+    max_tool_calls: Optional[int] = None
+    deadline_s: Optional[float] = None
+
+    def exhausted(self, usage: Optional[dict]) -> Optional[str]:
+        """Returns the name of the first exhausted limit, or None."""
+        if not usage:
+            return None
+        if self.max_llm_calls is not None and usage["llm_calls"] >= self.max_llm_calls:
+            return "max_llm_calls"
+        if self.max_input_tokens is not None and usage["input_tokens"] >= self.max_input_tokens:
+            return "max_input_tokens"
+        if self.max_output_tokens is not None and usage["output_tokens"] >= self.max_output_tokens:
+            return "max_output_tokens"
+        # Tool calls are counted when the model requests them, before they run.
+        if self.max_tool_calls is not None and usage["tool_calls"] > self.max_tool_calls:
+            return "max_tool_calls"
+        if self.deadline_s is not None and elapsed(usage) >= self.deadline_s:
+            return "deadline"
+        return None
+
+    def remaining_s(self, usage: Optional[dict]) -> Optional[float]:
+        """Seconds left before the deadline, or None when there is no deadline."""
+        if self.deadline_s is None:
+            return None
+        if not usage:
+            return self.deadline_s
+        return max(self.deadline_s - elapsed(usage), 0.0)
+
+
+UNLIMITED_BUDGET = RunBudget()
+
+
+def start_usage(usage: Optional[dict]) -> dict:
+    """Returns a copy of the run's usage, starting the clock on the first step."""
+    if usage:
+        return dict(usage)
+    return {
+        "llm_calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "tool_calls": 0,
+        "started_at": time.monotonic(),
+        "elapsed_s": 0.0,
+        "exhausted": None,
+    }
+
+
+def elapsed(usage: dict) -> float:
+    return time.monotonic() - usage["started_at"]
+
+
+def record_llm_call(usage: dict, llm_calls: int, input_tokens: int, output_tokens: int, response: Any) -> dict:
+    """Adds one node's model usage, including the tool calls the model asked for."""
+    usage["llm_calls"] += llm_calls
+    usage["input_tokens"] += input_tokens
+    usage["output_tokens"] += output_tokens
+    usage["tool_calls"] += len(getattr(response, "tool_calls", None) or [])
+    usage["elapsed_s"] = round(elapsed(usage), 3)
+    return usage
+
+
+def usage_since(usage: dict, before: Optional[dict]) -> dict:
+    """
+    What a run spent since `before`, the usage it started from. A worker
+    graph starts from its supervisor's usage and reports this back.
+    """
+    before = before or {}
+    spent = {key: usage[key] - before.get(key, 0) for key in ("llm_calls", "input_tokens", "output_tokens", "tool_calls")}
+    spent["exhausted"] = usage.get("exhausted")
+    return spent
+
+
+def add_usage(usage: dict, spent: dict) -> dict:
+    """Adds what a worker run spent (see `usage_since`) to this run's usage."""
+    for key in ("llm_calls", "input_tokens", "output_tokens", "tool_calls"):
+        usage[key] += spent.get(key, 0)
+    usage["exhausted"] = usage.get("exhausted") or spent.get("exhausted")
+    usage["elapsed_s"] = round(elapsed(usage), 3)
+    return usage
+
+
+def best_answer_so_far(messages: Sequence[Any], generated_command: Optional[str] = None) -> Optional[str]:
+    """The latest final (non tool-calling) text answer in the conversation."""
+    if generated_command:
+        return generated_command
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and not message.tool_calls:
+            text = response_text(message)
+            if text:
+                return text
+    return None
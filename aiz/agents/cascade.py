@@ -0,0 +1,269 @@
+import time
+import shlex
+import asyncio
+import logging
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+from aiz.tools.command_validator import CommandValidator, conversation_help_lookup
+
+
+logger = logging.getLogger(__name__)
+
+# A check receives the candidate response and the conversation it was produced
+# from. It returns None when the response is acceptable, or a short reason
+# string explaining why the cascade should escalate to the next tier.
+CascadeCheck = Callable[[Any, Sequence[Any]], Optional[str]]
+
+# Sync model calls with a timeout run here so the caller can stop waiting.
+_timed_calls = ContextThreadPoolExecutor(thread_name_prefix="aiz-model-call")
+
+HEDGING_PHRASES = (
+    "i'm not sure",
+    "i am not sure",
+    "not certain",
+    "i think",
+    "might be",
+    "may need to",
+    "it depends",
+    "i don't know",
+    "unable to",
+    "cannot determine",
+)
+
+
+def response_text(response: Any) -> str:
+    """Returns the plain text of an AI message, flattening content blocks."""
+    content = getattr(response, "content", "")
+    if isinstance(content, str):
+        return content.strip()
+    parts = []
+    for block in content:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts).strip()
+
+
+def check_single_command(response: Any, messages: Sequence[Any]) -> Optional[str]:
+    """Escalates when the final answer is not exactly one shell command."""
+    if getattr(response, "tool_calls", None):
+        return None
+    text = response_text(response)
+    if not text:
+        return "empty answer"
+    if "```" in text or text.startswith("`"):
+        return "answer is wrapped in markdown"
+    if len(text.splitlines()) > 1:
+        return "answer spans multiple lines"
+    try:
+        shlex.split(text)
+    except ValueError:
+        return "answer is not a parseable shell command"
+    return None
+
+
+def check_flags_in_help(response: Any, messages: Sequence[Any]) -> Optional[str]:
+    """
+    Escalates when the final answer uses a flag that is not documented in the
+    help fetched during this conversation. Tools whose help was not fetched
+    are not checked, so this never spawns a subprocess.
+    """
+    if getattr(response, "tool_calls", None):
+        return None
+    validator = CommandValidator(conversation_help_lookup(messages), check_installed=False)
+    problems = validator.validate(response_text(response))
+    return problems[0] if problems else None
+
+
+def check_confidence(response: Any, messages: Sequence[Any]) -> Optional[str]:
+    """Escalates on a low confidence signal: truncation or hedging language."""
+    metadata = getattr(response, "response_metadata", None) or {}
+    stop_reason = metadata.get("stop_reason") or metadata.get("stopReason")
+    if stop_reason in ("max_tokens", "length"):
+        return "response was truncated"
+    if getattr(response, "tool_calls", None):
+        return None
+    text = response_text(response).lower()
+    for phrase in HEDGING_PHRASES:
+        if phrase in text:
+            return f"low confidence ('{phrase}')"
+    return None
+
+
+GENERATOR_CHECKS: List[CascadeCheck] = [
+    check_single_command,
+    check_flags_in_help,
+    check_confidence,
+]
+
+
+@dataclass
+class TierStats:
+    """Counters for a single tier of the cascade."""
+    calls: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+
+@dataclass
+class CascadeStats:
+    """
+    Aggregated usage of a ModelCascade. Pass one instance to the agent
+    builders to read escalation rates and per-tier latency after a run.
+    """
+    tiers: List[TierStats] = field(default_factory=list)
+    requests: int = 0
+
+    def _tier(self, index: int) -> TierStats:
+        while len(self.tiers) <= index:
+            self.tiers.append(TierStats())
+        return self.tiers[index]
+
+    def record(self, tier: int, latency: float, accepted: bool) -> None:
+        stats = self._tier(tier)
+        stats.calls += 1
+        stats.total_latency += latency
+        if accepted:
+            stats.accepted += 1
+        else:
+            stats.escalated += 1
+
+    def report(self) -> dict[str, Any]:
+        """Returns a JSON-serializable summary of the cascade usage."""
+        return {
+            "requests": self.requests,
+            "tiers": [
+                {
+                    "tier": index,
+                    "calls": stats.calls,
+                    "accepted": stats.accepted,
+                    "escalated": stats.escalated,
+                    "escalation_rate": stats.escalated / stats.calls if stats.calls else 0.0,
+                    "mean_latency_s": round(stats.mean_latency, 4),
+                }
+                for index, stats in enumerate(self.tiers)
+            ],
+        }
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+class CascadeResult(NamedTuple):
+    """The accepted response of a cascade run and what it cost."""
+    response: Any
+    tier: int
+    llm_calls: int
+    input_tokens: int
+    output_tokens: int
+
+
+def _token_usage(response: Any) -> tuple[int, int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+class ModelCascade:
+    """
+    Sends each request to the cheapest model first and only escalates to the
+    next (stronger, slower) tier when one of the checks rejects the answer.
+    The last tier's answer is always accepted.
+    """
+
+    def __init__(
+        self,
+        tiers: Sequence[Any],
+        checks: Optional[Sequence[CascadeCheck]] = None,
+        stats: Optional[CascadeStats] = None,
+    ):
+        """
+        Args:
+            tiers: Runnable LLMs (already bound to tools), ordered cheapest first.
+            checks: Functions deciding whether a response should be escalated.
+            stats: Optional shared stats collector.
+        """
+        if not tiers:
+            raise ValueError("ModelCascade requires at least one model tier.")
+        self.tiers = list(tiers)
+        self.checks = list(checks or [])
+        self.stats = stats if stats is not None else CascadeStats()
+
+    def _rejection(self, response: Any, messages: Sequence[Any]) -> Optional[str]:
+        for check in self.checks:
+            reason = check(response, messages)
+            if reason:
+                return reason
+        return None
+
+    def _settle(self, index: int, response: Any, messages: Sequence[Any], latency: float) -> bool:
+        """Records one tier's attempt and returns True if its response is accepted."""
+        reason = None if index == len(self.tiers) - 1 else self._rejection(response, messages)
+        self.stats.record(index, latency, accepted=reason is None)
+        if reason is None:
+            logger.info(f"Cascade tier {index} answered in {latency:.2f}s")
+            return True
+        logger.info(f"Cascade tier {index} escalated after {latency:.2f}s: {reason}")
+        return False
+
+    def invoke(self, messages: Sequence[Any], timeout: Optional[float] = None) -> CascadeResult:
+        """
+        Runs the cascade and returns the accepted response together with the
+        index of the tier that produced it and the usage of every tier tried.
+
+        Args:
+            messages: The conversation to answer.
+            timeout: Seconds all tiers together may take, or None. Raises
+                     TimeoutError once they are up; a sync call cannot be
+                     interrupted, so the late response is discarded.
+        """
+        self.stats.requests += 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        input_tokens = output_tokens = 0
+        for index, llm in enumerate(self.tiers):
+            started = time.perf_counter()
+            if deadline is None:
+                response = llm.invoke(messages)
+            else:
+                call = _timed_calls.submit(llm.invoke, messages)
+                try:
+                    response = call.result(timeout=_time_left(deadline))
+                except concurrent.futures.TimeoutError:
+                    call.cancel()
+                    raise TimeoutError(f"Model call did not finish within {timeout:.1f}s.") from None
+            used_in, used_out = _token_usage(response)
+            input_tokens += used_in
+            output_tokens += used_out
+            if self._settle(index, response, messages, time.perf_counter() - started):
+                return CascadeResult(response, index, index + 1, input_tokens, output_tokens)
+
+        raise RuntimeError("unreachable")
+
+    async def ainvoke(self, messages: Sequence[Any], timeout: Optional[float] = None) -> CascadeResult:
+        """Async version of `invoke`; model calls run on the event loop and are cancelled on timeout."""
+        self.stats.requests += 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        input_tokens = output_tokens = 0
+        for index, llm in enumerate(self.tiers):
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(llm.ainvoke(messages), _time_left(deadline))
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Model call did not finish within {timeout:.1f}s.") from None
+            used_in, used_out = _token_usage(response)
+            input_tokens += used_in
+            output_tokens += used_out
+            if self._settle(index, response, messages, time.perf_counter() - started):
+                return CascadeResult(response, index, index + 1, input_tokens, output_tokens)
+
+        raise RuntimeError("unreachable")
@@ -1,5 +1,7 @@
-from langchain_core.messages import HumanMessage
-from typing import Any
+from functools import partial
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from typing import Any, Optional, Union
 
 
 from langgraph.graph import StateGraph, END
@@ -9,21 +11,84 @@ from langgraph.prebuilt import ToolNode
 
 from aiz.builders.provider_bulders import ProviderFactory
 from aiz.tools.command_helper import CommandHelpTool
+from aiz.tools.command_journal import CommandJournal, format_examples
+from aiz.tools.man_pages import ManPageTool, man_page_lookup, aman_page_lookup
 from aiz.agents.state import GlobalAgentState
+from aiz.tools.command_validator import (
+    CommandValidator, chain_lookups, achain_lookups, conversation_help_lookup,
+    live_help_lookup, alive_help_lookup, format_correction
+)
+from aiz.agents.cascade import ModelCascade, CascadeStats, GENERATOR_CHECKS, response_text
+from aiz.agents.budget import RunBudget, UNLIMITED_BUDGET, start_usage, record_llm_call, best_answer_so_far
 
+# How many times the validator may send a command back before accepting it as-is.
+MAX_VALIDATION_ATTEMPTS = 2
+# How many past successful commands are shown to the model as examples.
+FEW_SHOT_EXAMPLES = 3
 
-def call_generator_model(state: GlobalAgentState, llm_with_tools) -> dict[str, Any]:
+
+def _is_system_message(message: Any) -> bool:
+    if isinstance(message, tuple):
+        return message[0] == "system"
+    return isinstance(message, SystemMessage)
+
+def with_journal_examples(messages: list, user_query: Optional[str], journal: Optional[CommandJournal]) -> list:
+    """
+    Inserts similar past successful commands as few-shot turns right after the
+    system prompt. They are only added to the model input, never to the state.
+    """
+    if journal is None or not user_query:
+        return messages
+    examples = format_examples(journal.similar(user_query, limit=FEW_SHOT_EXAMPLES))
+    if not examples:
+        return messages
+    split = 0
+    while split < len(messages) and _is_system_message(messages[split]):
+        split += 1
+    return messages[:split] + examples + messages[split:]
+
+def call_generator_model(
+    state: GlobalAgentState,
+    cascade: ModelCascade,
+    journal: Optional[CommandJournal] = None,
+    budget: RunBudget = UNLIMITED_BUDGET,
+) -> dict[str, Any]:
     """
     The primary "reasoning" node. It calls the LLM with the current
-    conversation state and decides the next action.
+    conversation state and decides the next action. The cheapest model tier
+    answers first; stronger tiers are only used when its answer fails a check.
+    The call may take at most the time left before the budget's deadline.
     """
     print("--- Calling Generator LLM ---")
     
-    messages = state["messages"]    
-    response = llm_with_tools.invoke(messages)
-    return {"messages": [response]}
-
-def should_continue(state: GlobalAgentState) -> str:
+    usage = start_usage(state.get("budget_usage"))
+    messages = with_journal_examples(list(state["messages"]), state.get("user_query"), journal)
+    try:
+        result = cascade.invoke(messages, timeout=budget.remaining_s(usage))
+    except TimeoutError:
+        return stop_on_budget({**state, "budget_usage": usage}, budget)
+    usage = record_llm_call(usage, result.llm_calls, result.input_tokens, result.output_tokens, result.response)
+    return {"messages": [result.response], "model_tier": result.tier, "budget_usage": usage}
+
+async def acall_generator_model(
+    state: GlobalAgentState,
+    cascade: ModelCascade,
+    journal: Optional[CommandJournal] = None,
+    budget: RunBudget = UNLIMITED_BUDGET,
+) -> dict[str, Any]:
+    """Async version of `call_generator_model`, used when the graph is run with ainvoke/astream."""
+    print("--- Calling Generator LLM (async) ---")
+
+    usage = start_usage(state.get("budget_usage"))
+    messages = with_journal_examples(list(state["messages"]), state.get("user_query"), journal)
+    try:
+        result = await cascade.ainvoke(messages, timeout=budget.remaining_s(usage))
+    except TimeoutError:
+        return stop_on_budget({**state, "budget_usage": usage}, budget)
+    usage = record_llm_call(usage, result.llm_calls, result.input_tokens, result.output_tokens, result.response)
+    return {"messages": [result.response], "model_tier": result.tier, "budget_usage": usage}
+
+def should_continue(state: GlobalAgentState, budget: RunBudget = UNLIMITED_BUDGET) -> str:
     """
     The router or "conditional edge". It checks the last message in the state
     and decides where to go next.
@@ -31,40 +96,149 @@ def should_continue(state: GlobalAgentState) -> str:
     print("--- Checking Agent State ---")
     last_message = state["messages"][-1]
 
+    if (state.get("budget_usage") or {}).get("exhausted"):
+        print(">>> Decision: Stopped on budget, the best answer so far is final.")
+        return "end_workflow"
     if last_message.tool_calls:
+        # Running the tools only makes sense if the model can be called again afterwards.
+        if budget.exhausted(state.get("budget_usage")):
+            print(">>> Decision: Budget exhausted, stopping with the best answer so far.")
+            return "budget_exhausted"
         print(">>> Decision: Agent wants to use a tool.")
         return "continue_to_tools"
     else:
         print(">>> Decision: Agent has a final answer.")
-        return "end_workflow"
+        return "validate_command"
+
+def validate_generated_command(state: GlobalAgentState) -> dict[str, Any]:
+    """
+    Checks the final answer against the parsed help of the installed tool.
+    Problems are sent back to the generator as a correction message within
+    the same run, instead of surfacing later as a failed execution.
+    """
+    print("--- Validating Generated Command ---")
+    command = response_text(state["messages"][-1])
+
+    # Help the generator already fetched is reused; anything else is read
+    # from the installed binary (cached per binary version), then the man page.
+    validator = CommandValidator(chain_lookups(
+        conversation_help_lookup(state["messages"]), live_help_lookup, man_page_lookup
+    ))
+    return _validation_update(state, command, validator.validate(command))
+
+async def avalidate_generated_command(state: GlobalAgentState) -> dict[str, Any]:
+    """Async version of `validate_generated_command`; help subprocesses run on the event loop."""
+    print("--- Validating Generated Command (async) ---")
+    command = response_text(state["messages"][-1])
+
+    lookup = achain_lookups(conversation_help_lookup(state["messages"]), alive_help_lookup, aman_page_lookup)
+    problems = await CommandValidator(lookup).avalidate(command)
+    return _validation_update(state, command, problems)
+
+def _validation_update(state: GlobalAgentState, command: str, problems: list[str]) -> dict[str, Any]:
+    attempts = state.get("validation_attempts") or 0
+    if problems and attempts < MAX_VALIDATION_ATTEMPTS:
+        print(f">>> Validation failed: {problems}")
+        return {
+            "messages": [HumanMessage(content=format_correction(command, problems))],
+            "validation_attempts": attempts + 1,
+            "validation_errors": problems,
+        }
+    return {"generated_command": command, "validation_errors": problems}
+
+def after_validation(state: GlobalAgentState, budget: RunBudget = UNLIMITED_BUDGET) -> str:
+    """Routes back to the generator when the validator asked for a correction."""
+    if isinstance(state["messages"][-1], HumanMessage):
+        if budget.exhausted(state.get("budget_usage")):
+            return "budget_exhausted"
+        return "regenerate"
+    return "end_workflow"
 
-def build_command_generation_agent(providers_config: dict):
+def stop_on_budget(state: GlobalAgentState, budget: RunBudget) -> dict[str, Any]:
+    """
+    Ends the run gracefully once the budget is spent: the latest command the
+    model produced, if any, becomes the final answer.
+    """
+    usage = start_usage(state.get("budget_usage"))
+    # A model call cut off at the deadline can end a hair before it.
+    usage["exhausted"] = budget.exhausted(usage) or "deadline"
+    best = best_answer_so_far(state["messages"], state.get("generated_command"))
+    print(f"--- Generator stopped: budget exhausted ({usage['exhausted']}) ---")
+    return {
+        "messages": [AIMessage(content=best or f"No command was generated before the budget ran out ({usage['exhausted']}).")],
+        "generated_command": best,
+        "budget_usage": usage,
+    }
+
+def build_command_generation_agent(
+    providers_config: Union[dict, list[dict]],
+    cascade_stats: Optional[CascadeStats] = None,
+    journal: Optional[CommandJournal] = None,
+    budget: RunBudget = UNLIMITED_BUDGET,
+):
+    """
+    Builds the command generation graph.
+
+    Args:
+        providers_config: A provider configuration, or a list of them ordered
+                          from the cheapest model to the strongest one.
+        cascade_stats: Optional collector for escalation rates and per-tier latency.
+        journal: Optional journal of approved commands used for few-shot examples.
+        budget: Per-run limits on LLM calls, tokens, tool calls and wall-clock time.
+                Usage is reported in the final state under `budget_usage`.
+    """
     provider_factory = ProviderFactory()
-    llm = provider_factory.build(providers_config)
+    llms = provider_factory.build_tiers(providers_config)
 
-    tools = [CommandHelpTool()]
-    llm_with_tools = llm.bind_tools(tools)
+    tools = [CommandHelpTool(), ManPageTool()]
+    cascade = ModelCascade(
+        [llm.bind_tools(tools) for llm in llms],
+        checks=GENERATOR_CHECKS,
+        stats=cascade_stats,
+    )
 
-    agent_node = lambda state: call_generator_model(state, llm_with_tools)
+    # Each node has a sync and an async implementation: invoke/stream use the
+    # former, ainvoke/astream_events the latter, so async runs never need a thread.
+    agent_node = RunnableLambda(
+        partial(call_generator_model, cascade=cascade, journal=journal, budget=budget),
+        afunc=partial(acall_generator_model, cascade=cascade, journal=journal, budget=budget),
+        name="generator",
+    )
+    validator_node = RunnableLambda(
+        validate_generated_command, afunc=avalidate_generated_command, name="validator"
+    )
 
 
     workflow = StateGraph(GlobalAgentState)
 
     workflow.add_node("generator", agent_node)
     workflow.add_node("action", ToolNode(tools))
-
+    workflow.add_node("validator", validator_node)
+    workflow.add_node("budget_exhausted", lambda state: stop_on_budget(state, budget))
 
     workflow.set_entry_point("generator")
     workflow.add_conditional_edges(
         "generator",
-        should_continue,
+        lambda state: should_continue(state, budget),
         {
             "continue_to_tools": "action",
+            "validate_command": "validator",
+            "budget_exhausted": "budget_exhausted",
+            "end_workflow": END,
+        }
+    )
+    workflow.add_conditional_edges(
+        "validator",
+        lambda state: after_validation(state, budget),
+        {
+            "regenerate": "generator",
+            "budget_exhausted": "budget_exhausted",
             "end_workflow": END
         }
     )
 
     workflow.add_edge("action", "generator")
+    workflow.add_edge("budget_exhausted", END)
 
     app = workflow.compile()
     
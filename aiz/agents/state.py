@@ -24,8 +24,24 @@ class GlobalAgentState(TypedDict):
     # The final command generated by the specialist agent.
     generated_command: Optional[str]
 
+    # Problems found by the offline command validator and how many times the
+    # generator has been asked to correct its command.
+    validation_errors: Optional[List[str]]
+    validation_attempts: Optional[int]
+
     # The result after executing a command with the CommandExecutorTool.
     command_output: Optional[str]
 
     # A field for the supervisor to break down a complex task into a plan.
     plan: Optional[List[str]]
+
+    # The answer shown to the user once the supervisor finishes.
+    final_answer: Optional[str]
+
+    # LLM calls, tokens, tool calls and elapsed time used by this run, and the
+    # budget limit that stopped it early, if any.
+    budget_usage: Optional[dict]
+
+    # Index of the model cascade tier that produced the latest generator answer
+    # (0 is the cheapest model).
+    model_tier: Optional[int]
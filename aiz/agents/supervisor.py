@@ -1,7 +1,11 @@
-from langchain_core.tools import Tool
+from functools import partial
+from pydantic import BaseModel, Field
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import ToolNode, InjectedState
+from langchain_core.messages import AIMessage, ToolMessage
+from typing import Annotated, Optional, Sequence, Union
 
 
 
@@ -11,31 +15,75 @@ from aiz.builders.provider_bulders import ProviderFactory
 from aiz.prompts.supervisor_prompts import SUPERVISOR_SYSTEM_PROMPT
 from aiz.prompts.generator_prompts import COMMAND_GENERATOR_SYSTEM_PROMPT
 from aiz.agents.command_generator import build_command_generation_agent, should_continue
+from aiz.agents.cascade import ModelCascade, CascadeStats
+from aiz.agents.budget import RunBudget, UNLIMITED_BUDGET, start_usage, record_llm_call, usage_since, add_usage
 
 from aiz.tools.command_executor import CommandExecutorTool
+from aiz.tools.command_journal import CommandJournal
+from aiz.tools.path_index import candidate_tools, format_tool_hint
 
 
-def create_generator_agent_tool(provider_config: dict) -> Tool:
+def worker_initial_state(user_query: str, budget_usage: Optional[dict] = None) -> dict:
+    """
+    Builds the generator's initial state. The target tool is resolved from the
+    query against the executables on PATH before any LLM call, and the model
+    is told which relevant tools are actually installed.
+
+    Args:
+        user_query: The request to generate a command for.
+        budget_usage: The supervisor's usage so far. The worker continues it,
+                      clock included, so both share one budget.
+    """
+    candidates = candidate_tools(user_query)
+    target_cli_tool = candidates[0] if candidates else None
+    print(f"--- Target tool resolved locally: {target_cli_tool or 'none'} ---")
+
+    messages = [("system", COMMAND_GENERATOR_SYSTEM_PROMPT)]
+    hint = format_tool_hint(candidates)
+    if hint:
+        messages.append(("system", hint))
+    messages.append(("user", user_query))
+    state = {
+        "messages": messages,
+        "user_query": user_query,
+        "target_cli_tool": target_cli_tool,
+    }
+    if budget_usage:
+        state["budget_usage"] = dict(budget_usage)
+    return state
+
+
+class GeneratorSpecialistInput(BaseModel):
+    """Input for the command generator specialist."""
+    user_query: str = Field(description="The user's full, original objective.")
+    # The supervisor's state, injected by its ToolNode and hidden from the model.
+    state: Annotated[Optional[dict], InjectedState] = None
+
+
+def create_generator_agent_tool(
+    provider_config: Union[dict, list[dict]],
+    cascade_stats: Optional[CascadeStats] = None,
+    journal: Optional[CommandJournal] = None,
+    budget: RunBudget = UNLIMITED_BUDGET,
+) -> StructuredTool:
     """
     This function builds the CommandGenerationAgent and wraps it as a Tool
     for the Supervisor to use.
     """
     print("--- Building Specialist: CommandGenerator Agent ---")
-    generator_agent_runnable = build_command_generation_agent(provider_config)
+    generator_agent_runnable = build_command_generation_agent(provider_config, cascade_stats, journal, budget)
 
-    def _invoke_worker_agent(user_query: str) -> str:
-        """A wrapper function to transform the input and extract the output."""
+    def _invoke_worker_agent(user_query: str, state: Optional[dict] = None) -> tuple[str, dict]:
+        """
+        A wrapper function to transform the input and extract the output.
+        Returns the final command and, as the tool artifact, what the worker
+        spent, which the supervisor adds to its own usage.
+        """
         print(f"--- Specialist agent receiving query: {user_query} ---")
         
         # 1. Construct the correct initial state for the worker
-        initial_state = {
-            "messages": [
-                ("system", COMMAND_GENERATOR_SYSTEM_PROMPT),
-                ("user", user_query)
-            ],
-            "user_query": user_query,
-            "target_cli_tool": "tbd" # Worker will figure this out now
-        }
+        supervisor_usage = (state or {}).get("budget_usage")
+        initial_state = worker_initial_state(user_query, supervisor_usage)
         
         # 2. Invoke the worker agent
         final_state = generator_agent_runnable.invoke(
@@ -44,26 +92,20 @@ def create_generator_agent_tool(provider_config: dict) -> Tool:
         )
         
         # 3. Extract and return just the final command string
-        return final_state['messages'][-1].content
+        return final_state['messages'][-1].content, worker_spent(final_state, supervisor_usage)
 
-    async def _ainvoke_worker_agent(user_query: str) -> str:
+    async def _ainvoke_worker_agent(user_query: str, state: Optional[dict] = None) -> tuple[str, dict]:
         """Async version of the wrapper."""
         print(f"--- Specialist agent receiving query (async): {user_query} ---")
-        initial_state = {
-            "messages": [
-                ("system", COMMAND_GENERATOR_SYSTEM_PROMPT),
-                ("user", user_query)
-            ],
-            "user_query": user_query,
-            "target_cli_tool": "tbd"
-        }
+        supervisor_usage = (state or {}).get("budget_usage")
+        initial_state = worker_initial_state(user_query, supervisor_usage)
         final_state = await generator_agent_runnable.ainvoke(
             initial_state,
             config={"configurable": {"thread_id": f"worker-session-{user_query[:10]}"}}
         )
-        return final_state['messages'][-1].content
+        return final_state['messages'][-1].content, worker_spent(final_state, supervisor_usage)
 
-    generator_tool = Tool(
+    generator_tool = StructuredTool.from_function(
         name="command_generator_specialist",
         description=(
             "Use this specialist agent to generate a precise shell command. "
@@ -71,12 +113,33 @@ def create_generator_agent_tool(provider_config: dict) -> Tool:
         ),
         # Use our new wrapper functions
         func=_invoke_worker_agent,
-        coroutine=_ainvoke_worker_agent
+        coroutine=_ainvoke_worker_agent,
+        args_schema=GeneratorSpecialistInput,
+        response_format="content_and_artifact",
     )
 
     return generator_tool
 
 
+def worker_spent(final_state: dict, supervisor_usage: Optional[dict]) -> dict:
+    """What a worker run spent beyond the supervisor usage it started from."""
+    final_usage = final_state.get("budget_usage") or supervisor_usage
+    return usage_since(final_usage, supervisor_usage) if final_usage else {}
+
+
+def with_worker_usage(usage: dict, messages: Sequence) -> dict:
+    """
+    Adds the usage of the workers that ran since the supervisor's last call,
+    reported as artifacts of their tool messages.
+    """
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        if message.name == "command_generator_specialist" and isinstance(message.artifact, dict):
+            usage = add_usage(usage, message.artifact)
+    return usage
+
+
 def format_final_output(state: GlobalAgentState) -> dict:
     """
     This node's only job is to prepare the clean, final output for the user.
@@ -94,10 +157,12 @@ def format_final_output(state: GlobalAgentState) -> dict:
     return {"final_answer": "Workflow complete, but could not determine final command output."}
 
 
-def call_supervisor_model(state, llm_with_tools):
+def call_supervisor_model(state, cascade: ModelCascade, budget: RunBudget = UNLIMITED_BUDGET):
     """
     Calls the supervisor LLM with the full message history.
     The system prompt is prepended to ensure it always has its instructions.
+    Worker usage is counted first, so a worker that spent the budget ends
+    the run here instead of costing one more call.
     """
     print("--- Calling Supervisor LLM ---")
     
@@ -105,17 +170,61 @@ def call_supervisor_model(state, llm_with_tools):
     messages = [("system", SUPERVISOR_SYSTEM_PROMPT)] + state["messages"]
     
     # Invoke the LLM
-    response = llm_with_tools.invoke(messages)
+    usage = with_worker_usage(start_usage(state.get("budget_usage")), state["messages"])
+    if budget.exhausted(usage) or usage["exhausted"]:
+        return stop_supervision_on_budget({**state, "budget_usage": usage}, budget)
+    try:
+        result = cascade.invoke(messages, timeout=budget.remaining_s(usage))
+    except TimeoutError:
+        return stop_supervision_on_budget({**state, "budget_usage": usage}, budget)
+    usage = record_llm_call(usage, result.llm_calls, result.input_tokens, result.output_tokens, result.response)
     
     # Return only the new AI message to be appended to the state
-    return {"messages": [response]}
+    return {"messages": [result.response], "budget_usage": usage}
+
+async def acall_supervisor_model(state, cascade: ModelCascade, budget: RunBudget = UNLIMITED_BUDGET):
+    """Async version of `call_supervisor_model`, used when the graph is run with ainvoke/astream."""
+    print("--- Calling Supervisor LLM (async) ---")
+
+    messages = [("system", SUPERVISOR_SYSTEM_PROMPT)] + state["messages"]
+    usage = with_worker_usage(start_usage(state.get("budget_usage")), state["messages"])
+    if budget.exhausted(usage) or usage["exhausted"]:
+        return stop_supervision_on_budget({**state, "budget_usage": usage}, budget)
+    try:
+        result = await cascade.ainvoke(messages, timeout=budget.remaining_s(usage))
+    except TimeoutError:
+        return stop_supervision_on_budget({**state, "budget_usage": usage}, budget)
+    usage = record_llm_call(usage, result.llm_calls, result.input_tokens, result.output_tokens, result.response)
+    return {"messages": [result.response], "budget_usage": usage}
+
+def stop_supervision_on_budget(state: GlobalAgentState, budget: RunBudget) -> dict:
+    """
+    Ends the run once the budget is spent, reporting the best result so far:
+    the command output if something ran, otherwise the generated command.
+    """
+    usage = start_usage(state.get("budget_usage"))
+    usage["exhausted"] = usage["exhausted"] or budget.exhausted(usage) or "deadline"
+    print(f"--- Supervisor stopped: budget exhausted ({usage['exhausted']}) ---")
+
+    best = None
+    for message in reversed(state["messages"]):
+        if isinstance(message, ToolMessage) and message.name in ("command_executor", "command_generator_specialist"):
+            best = message.content
+            break
+    answer = (
+        f"Stopped early: the run budget was exhausted ({usage['exhausted']}). "
+        + (f"Best result so far:\n{best}" if best else "No command was produced.")
+    )
+    return {"messages": [AIMessage(content=answer)], "final_answer": answer, "budget_usage": usage}
 
 # We need a more sophisticated router now
-def supervisor_router(state: GlobalAgentState) -> str: # Return type is string
+def supervisor_router(state: GlobalAgentState, budget: RunBudget = UNLIMITED_BUDGET) -> str: # Return type is string
     """The router for the supervisor agent."""
     last_message = state['messages'][-1]
     
     if last_message.tool_calls:
+        if budget.exhausted(state.get("budget_usage")):
+            return "budget_exhausted"
         return "action"
     
     if isinstance(last_message, ToolMessage) and last_message.name == "command_executor":
@@ -125,41 +234,67 @@ def supervisor_router(state: GlobalAgentState) -> str: # Return type is string
     # it means the workflow is finished.
     return "end" # Return the string 'end'
 
-def build_supervisor_agent(provider_config: dict):
+def build_supervisor_agent(
+    provider_config: Union[dict, list[dict]],
+    cascade_stats: Optional[CascadeStats] = None,
+    journal: Optional[CommandJournal] = None,
+    budget: RunBudget = UNLIMITED_BUDGET,
+):
     """
     Builds the main Supervisor agent that orchestrates other agents.
+
+    When `provider_config` is a tiered list, the supervisor only routes and
+    always runs on the cheapest tier; the full cascade is handed to the
+    command generator, where escalation actually pays off.
+
+    Approved commands are recorded in `journal` (by default the one in
+    ~/.aiz) and fed back to the generator as few-shot examples.
+
+    `budget` bounds the supervisor run together with every generator run it
+    starts: workers continue the supervisor's usage and clock, and what they
+    spend is added back to the supervisor's `budget_usage`.
     """
     print("--- Building Orchestrator: Supervisor Agent ---")
     
-    generator_agent_as_tool = create_generator_agent_tool(provider_config)
-    supervisor_tools = [generator_agent_as_tool, CommandExecutorTool()]
+    journal = journal if journal is not None else CommandJournal()
+    generator_agent_as_tool = create_generator_agent_tool(provider_config, cascade_stats, journal, budget)
+    supervisor_tools = [generator_agent_as_tool, CommandExecutorTool(journal=journal)]
 
     factory = ProviderFactory()
 
-    supervisor_llm = factory.build(provider_config) 
-    llm_with_supervisor_tools = supervisor_llm.bind_tools(supervisor_tools)
+    supervisor_llm = factory.build_tiers(provider_config)[0]
+    supervisor_cascade = ModelCascade([supervisor_llm.bind_tools(supervisor_tools)])
     
     workflow = StateGraph(GlobalAgentState)
     
-    supervisor_node = lambda state: call_supervisor_model(state, llm_with_supervisor_tools)
+    # Async runs use the async node (and the worker tool's coroutine), so a
+    # single event loop can drive many sessions without a thread per call.
+    supervisor_node = RunnableLambda(
+        partial(call_supervisor_model, cascade=supervisor_cascade, budget=budget),
+        afunc=partial(acall_supervisor_model, cascade=supervisor_cascade, budget=budget),
+        name="supervisor",
+    )
 
     
     workflow.add_node("supervisor", supervisor_node)
     workflow.add_node("action", ToolNode(supervisor_tools))
     workflow.add_node("final_output", format_final_output) # <-- ADD NEW NODE
+    workflow.add_node("budget_exhausted", lambda state: stop_supervision_on_budget(state, budget))
 
     workflow.set_entry_point("supervisor")
 
 
     # Use the new router
-    workflow.add_conditional_edges("supervisor", supervisor_router, {
+    workflow.add_conditional_edges("supervisor", lambda state: supervisor_router(state, budget), {
         "action": "action",
         "final_output": "final_output",
+        "budget_exhausted": "budget_exhausted",
         "end": END  # <-- ADD THIS MAPPING
     })
 
     workflow.add_edge("action", "supervisor") # The loop remains
     workflow.add_edge("final_output", END) # The formatter is the true end
+    workflow.add_edge("budget_exhausted", END)
 
     # 5. Compile and return the final orchestrator app
     app = workflow.compile()
@@ -1,6 +1,6 @@
-from typing import Dict, Any, Type
+from typing import Dict, Any, List, Type, Union
 
-from ..providers import AnthropicChatModel, AwsBedrockModel, ModelConfigurationError, UnifiedLanguageModel
+from ..providers import AnthropicChatModel, AwsBedrockModel, HedgedChatModel, ModelConfigurationError, UnifiedLanguageModel
 
 class ProviderFactory:
     """
@@ -11,6 +11,7 @@ class ProviderFactory:
         self._build_map: Dict[str, Type[UnifiedLanguageModel]] = {
             "anthropic": AnthropicChatModel,
             "aws_bedrock": AwsBedrockModel,
+            "hedged": HedgedChatModel,
         }
 
     def _get_builder_class(self, provider: str) -> Type[UnifiedLanguageModel]:
@@ -65,6 +66,26 @@ class ProviderFactory:
         except Exception as e:
             raise e
 
+    def build_tiers(self, configs: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Any]:
+        """
+        Builds a tiered list of language model instances for a model cascade.
+
+        The list must be ordered from the fastest, cheapest model to the
+        strongest one. A single configuration dictionary is treated as a
+        one-tier list, so existing callers keep working unchanged.
+
+        Args:
+            configs: A configuration dictionary or a list of them.
+
+        Returns:
+            A list of runnable LangChain LLM instances, in tier order.
+        """
+        if isinstance(configs, dict):
+            configs = [configs]
+        if not configs:
+            raise ModelConfigurationError("At least one model configuration is required.")
+        return [self.build(config) for config in configs]
+
 
 if __name__ == "__main__":
     provider_config = {
@@ -3,6 +3,7 @@ from .providers_exception import ModelConfigurationError
 
 from .aws_bedrock import AwsBedrockModel
 from .anthropic import AnthropicChatModel
+from .hedged import HedgedChatModel
 
 __all__ = [
     "UnifiedLanguageModel"
@@ -0,0 +1,284 @@
+import time
+import bisect
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .base_provider import UnifiedLanguageModel
+from .providers_exception import ModelConfigurationError
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, log-spaced 10ms..120s.
+LATENCY_BUCKETS = [round(0.01 * 1.25 ** i, 4) for i in range(43)]
+
+
+class LatencyHistogram:
+    """A fixed-bucket latency histogram that can answer percentile queries."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.total += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Returns the bucket bound below which `fraction` of samples fall, or None if empty."""
+        with self._lock:
+            if not self.total:
+                return None
+            threshold = fraction * self.total
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= threshold:
+                    return LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+
+class BackendStats:
+    """Latency and outcome counters for one backend of a hedged model."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.first_token = LatencyHistogram()
+        # Full response times of unstreamed (sync) calls, kept apart so they
+        # do not inflate the first-token percentile that triggers hedging.
+        self.response_time = LatencyHistogram()
+        self.requests = 0
+        self.wins = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "requests": self.requests,
+            "wins": self.wins,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "first_token_p50_s": self.first_token.percentile(0.5),
+            "first_token_p95_s": self.first_token.percentile(0.95),
+            "response_p50_s": self.response_time.percentile(0.5),
+            "response_p95_s": self.response_time.percentile(0.95),
+        }
+
+
+class _Attempt:
+    """One in-flight streaming request to a backend."""
+
+    def __init__(self, index: int, task: "asyncio.Task", first_token: asyncio.Event):
+        self.index = index
+        self.task = task
+        self.first_token = first_token
+
+
+class HedgedChatRunnable(Runnable):
+    """
+    A chat model runnable that spreads each request over several backends.
+
+    The first backend is the primary. If it has not produced a first token
+    within the configured percentile of its own first-token latency, the
+    request is also sent to the next backend; whichever starts answering first
+    wins and the other request is cancelled. Errors fail over to the next
+    backend immediately. Hedging needs cancellation, so it only happens on the
+    async path; synchronous calls get failover only.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Any],
+        names: Sequence[str],
+        stats: Optional[List[BackendStats]] = None,
+        hedge_percentile: float = 0.95,
+        min_samples: int = 20,
+        initial_hedge_delay_s: float = 2.0,
+    ):
+        self.backends = list(backends)
+        self.names = list(names)
+        self.stats = stats if stats is not None else [BackendStats(name) for name in self.names]
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.initial_hedge_delay_s = initial_hedge_delay_s
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "HedgedChatRunnable":
+        """Binds the same tools to every backend; latency stats stay shared."""
+        return HedgedChatRunnable(
+            [backend.bind_tools(tools, **kwargs) for backend in self.backends],
+            self.names,
+            stats=self.stats,
+            hedge_percentile=self.hedge_percentile,
+            min_samples=self.min_samples,
+            initial_hedge_delay_s=self.initial_hedge_delay_s,
+        )
+
+    def hedge_delay(self, index: int) -> float:
+        """How long to wait for backend `index`'s first token before hedging."""
+        histogram = self.stats[index].first_token
+        if histogram.total < self.min_samples:
+            return self.initial_hedge_delay_s
+        return histogram.percentile(self.hedge_percentile) or self.initial_hedge_delay_s
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [stats.report() for stats in self.stats]
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        last_error: Optional[BaseException] = None
+        for index, backend in enumerate(self.backends):
+            stats = self.stats[index]
+            stats.requests += 1
+            started = time.perf_counter()
+            try:
+                response = backend.invoke(input, config, **kwargs)
+            except Exception as e:
+                stats.errors += 1
+                last_error = e
+                logger.warning(f"Backend '{self.names[index]}' failed, failing over: {e}")
+                continue
+            stats.response_time.record(time.perf_counter() - started)
+            stats.wins += 1
+            return response
+        raise last_error
+
+    async def _stream(self, index: int, input: Any, config: Optional[RunnableConfig], first_token: asyncio.Event, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        aggregate = None
+        async for chunk in self.backends[index].astream(input, config, **kwargs):
+            if not first_token.is_set() and (chunk.content or getattr(chunk, "tool_call_chunks", None)):
+                self.stats[index].first_token.record(time.perf_counter() - started)
+                first_token.set()
+            aggregate = chunk if aggregate is None else aggregate + chunk
+        first_token.set()
+        if aggregate is None:
+            raise ModelConfigurationError(f"Backend '{self.names[index]}' returned an empty stream.")
+        return message_chunk_to_message(aggregate)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        untried = list(range(len(self.backends)))
+        running: List[_Attempt] = []
+        last_error: Optional[BaseException] = None
+
+        def launch() -> _Attempt:
+            index = untried.pop(0)
+            self.stats[index].requests += 1
+            first_token = asyncio.Event()
+            task = asyncio.ensure_future(self._stream(index, input, config, first_token, **kwargs))
+            attempt = _Attempt(index, task, first_token)
+            running.append(attempt)
+            return attempt
+
+        async def cancel(attempts: Sequence[_Attempt]) -> None:
+            for attempt in attempts:
+                attempt.task.cancel()
+                self.stats[attempt.index].cancelled += 1
+            await asyncio.gather(*(attempt.task for attempt in attempts), return_exceptions=True)
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_delay(running[0].index)
+        try:
+            while running:
+                waiters = {asyncio.ensure_future(attempt.first_token.wait()): attempt for attempt in running}
+                timeout = max(hedge_at - time.monotonic(), 0) if untried else None
+                done, _ = await asyncio.wait(
+                    list(waiters) + [attempt.task for attempt in running],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for waiter in waiters:
+                    waiter.cancel()
+
+                failed = [attempt for attempt in running if attempt.task.done() and attempt.task.exception()]
+                for attempt in failed:
+                    running.remove(attempt)
+                    self.stats[attempt.index].errors += 1
+                    last_error = attempt.task.exception()
+                    logger.warning(f"Backend '{self.names[attempt.index]}' failed, failing over: {last_error}")
+                if failed and not running and untried:
+                    launch()
+                    hedge_at = time.monotonic() + self.hedge_delay(running[-1].index)
+                    continue
+
+                leaders = [attempt for attempt in running if attempt.first_token.is_set()]
+                if leaders:
+                    winner = leaders[0]
+                    losers = [attempt for attempt in running if attempt is not winner]
+                    await cancel(losers)
+                    # Cancelled backends did not fail; they stay eligible in
+                    # case the winner fails mid-stream.
+                    untried.extend(attempt.index for attempt in losers)
+                    untried.sort()
+                    running = [winner]
+                    try:
+                        response = await winner.task
+                    except Exception as e:
+                        running = []
+                        self.stats[winner.index].errors += 1
+                        last_error = e
+                        logger.warning(f"Backend '{self.names[winner.index]}' failed mid-stream, failing over: {e}")
+                        if untried:
+                            launch()
+                            hedge_at = time.monotonic() + self.hedge_delay(running[-1].index)
+                        continue
+                    self.stats[winner.index].wins += 1
+                    return response
+
+                if not done and untried:
+                    logger.info(f"No first token from '{self.names[running[0].index]}' in time, hedging.")
+                    launch()
+                    hedge_at = time.monotonic() + self.hedge_delay(running[-1].index)
+        finally:
+            if running:
+                await cancel([attempt for attempt in running if not attempt.task.done()])
+
+        raise last_error
+
+
+class HedgedChatModel(UnifiedLanguageModel):
+    """
+    A composite provider over several backends (e.g. Anthropic and Bedrock)
+    that hedges slow requests and fails over on errors.
+    """
+
+    def __init__(self, model_id: str = "hedged", **kwargs: Any):
+        """
+        Initializes the hedged model wrapper.
+
+        Args:
+            model_id: A label for the composite model.
+            **kwargs: Must include 'backends', a list of provider configuration
+                      dictionaries, primary first. Optional:
+                - hedge_percentile (float, default 0.95)
+                - min_samples (int, default 20): samples needed before the
+                  percentile replaces initial_hedge_delay_s.
+                - initial_hedge_delay_s (float, default 2.0)
+        """
+        super().__init__(model_id, **kwargs)
+
+        backends = self.model_parameters.get("backends")
+        if not backends or len(backends) < 2:
+            raise ModelConfigurationError("HedgedChatModel needs at least two configurations in 'backends'.")
+
+    def _initialize_llm(self) -> HedgedChatRunnable:
+        """
+        Builds every backend through the ProviderFactory and wraps them.
+        """
+        # Imported here: the factory itself imports this module.
+        from ..builders.provider_bulders import ProviderFactory
+
+        factory = ProviderFactory()
+        backends = self.model_parameters["backends"]
+        return HedgedChatRunnable(
+            [factory.build(config) for config in backends],
+            [f"{config.get('provider')}:{config.get('model_id')}" for config in backends],
+            hedge_percentile=self.model_parameters.get("hedge_percentile", 0.95),
+            min_samples=self.model_parameters.get("min_samples", 20),
+            initial_hedge_delay_s=self.model_parameters.get("initial_hedge_delay_s", 2.0),
+        )
@@ -1,12 +1,15 @@
 from .command_helper import CommandHelpTool
 from .command_executor import CommandExecutorTool
+from .man_pages import ManPageTool
 
 tools = {
     "get_command_help": CommandHelpTool,
-    "execute_command": CommandExecutorTool
+    "execute_command": CommandExecutorTool,
+    "get_man_page": ManPageTool
 }
 
 __all__ = [
     "CommandHelpTool",
-    "CommandExecutorTool"
+    "CommandExecutorTool",
+    "ManPageTool"
 ]
\ No newline at end of file
@@ -1,29 +1,98 @@
+import os
+import time
+import signal
+import asyncio
+import logging
 import subprocess
-from typing import Type
+from typing import Annotated, Optional, Type
 from pydantic import BaseModel, Field
 
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import BaseTool
+from langgraph.prebuilt import InjectedState
 
 from rich.console import Console
 from rich.prompt import Confirm
 
+from .command_journal import CommandJournal
+from .command_validator import primary_tool
+from .installed_tools import known_version
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_TIMEOUT_S = 60
+# The exit status `timeout(1)` uses for a command that ran out of time.
+TIMEOUT_EXIT_STATUS = 124
+
 # You can keep CommandInput as it's the same shape, or create a new one for clarity.
 class ExecutorInput(BaseModel):
     """Input for the command executor tool."""
     command: str = Field(description="The shell command string to execute.")
+    query: str = Field(default="", description="The user's original request that this command fulfils.")
+    # Filled in by the graph's ToolNode and hidden from the model, so the
+    # journal still gets the request when the model leaves `query` out.
+    state: Annotated[Optional[dict], InjectedState] = None
+
+
+def request_from_state(state: Optional[dict]) -> str:
+    """The user's request for this run: `user_query`, else the first human message."""
+    if not state:
+        return ""
+    if state.get("user_query"):
+        return state["user_query"]
+    for message in state.get("messages", []):
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            return message.content
+    return ""
+
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
 
 class CommandExecutorTool(BaseTool):
     """A tool to execute a shell command after user confirmation."""
     name: str = "command_executor"
     description: str = "Executes a shell command after receiving user confirmation. Use this as the final step."
     args_schema: Type[BaseModel] = ExecutorInput
+    # Approved commands are recorded here so they can be reused as examples.
+    journal: Optional[CommandJournal] = None
 
-    def _run(self, command: str) -> str:
-        """Use the tool synchronously."""
+    def _record(self, query: str, command: str, exit_status: int, started: float) -> None:
+        if self.journal is None:
+            return
+        duration = time.perf_counter() - started
+        tool = primary_tool(command) or ""
+        try:
+            self.journal.record(
+                query=query,
+                tool=tool,
+                # Never `tool --version`: that would run something the user did not approve.
+                version=known_version(tool) if tool else None,
+                command=command,
+                exit_status=exit_status,
+                duration=duration,
+            )
+        except OSError as e:
+            logger.warning(f"Could not record command in the journal: {e}")
+
+    def _confirm(self, command: str) -> bool:
         console = Console()
         console.print(f"\n[yellow]Proposed command:[/yellow]\n[bold cyan]$ {command}[/bold cyan]")
+        return Confirm.ask("[bold]Do you want to execute this command?[/bold]", default=False, show_default=True)
+
+    def _run(self, command: str, query: str = "", state: Optional[dict] = None) -> str:
+        """Use the tool synchronously."""
+        query = query.strip() or request_from_state(state)
         
-        if Confirm.ask("[bold]Do you want to execute this command?[/bold]", default=False, show_default=True):
+        if self._confirm(command):
+            started = time.perf_counter()
             try:
                 # Use shell=True for simplicity here, but be aware of security implications
                 result = subprocess.run(
@@ -32,23 +101,54 @@ class CommandExecutorTool(BaseTool):
                     capture_output=True,
                     text=True,
                     check=True,
-                    timeout=60
+                    timeout=EXECUTION_TIMEOUT_S
                 )
+                self._record(query, command, result.returncode, started)
                 output = result.stdout if result.stdout else "Command executed successfully with no output."
                 return output
             except subprocess.CalledProcessError as e:
+                self._record(query, command, e.returncode, started)
                 return f"Error executing command:\n{e.stderr}"
             except subprocess.TimeoutExpired:
+                self._record(query, command, TIMEOUT_EXIT_STATUS, started)
                 return f"Error: The command '{command}' timed out."
         else:
             return "Execution cancelled by user."
 
 
-    async def _arun(self, command: str) -> str:
+    async def _arun(self, command: str, query: str = "", state: Optional[dict] = None) -> str:
         """Use the tool asynchronously."""
-        # The async version is trickier because standard input() is blocking.
-        # A simple approach for now:
-        return self._run(command)
+        query = query.strip() or request_from_state(state)
+        # The prompt reads stdin and the journal writes to disk; both would
+        # block every other session sharing the event loop.
+        if not await asyncio.to_thread(self._confirm, command):
+            return "Execution cancelled by user."
+
+        started = time.perf_counter()
+        # In its own session so a timeout can kill whatever the shell started,
+        # not just the shell; orphans would keep the output pipes open.
+        process = await asyncio.create_subprocess_shell(
+            command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True
+        )
+        timed_out = False
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=EXECUTION_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            # Also reached when the run is cancelled; never leave the command running.
+            if process.returncode is None:
+                _kill_process_group(process)
+                await process.wait()
+
+        if timed_out:
+            await asyncio.to_thread(self._record, query, command, TIMEOUT_EXIT_STATUS, started)
+            return f"Error: The command '{command}' timed out."
+        await asyncio.to_thread(self._record, query, command, process.returncode, started)
+        if process.returncode != 0:
+            return f"Error executing command:\n{stderr.decode(errors='replace')}"
+        output = stdout.decode(errors="replace")
+        return output if output else "Command executed successfully with no output."
     
 
 if __name__ == "__main__":
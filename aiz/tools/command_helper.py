@@ -1,11 +1,13 @@
 import subprocess
 import asyncio
 import logging
-from typing import Type
+from typing import Optional, Type
 from pydantic import BaseModel, Field
 import shlex
 from langchain.tools import BaseTool
 
+from .help_bundle import default_help_bundle
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,9 +25,24 @@ class CommandHelpTool(BaseTool):
     name: str = "command_help"
     description: str = "Useful for getting the --help output of a command-line tool."
     args_schema: Type[BaseModel] = CommandInput
+    # Serve help from the snapshot bundle (see help_bundle.py) when it matches
+    # the installed tool, without spawning a subprocess.
+    use_bundle: bool = True
+
+    def _bundled_help(self, command: str) -> Optional[str]:
+        bundle = default_help_bundle() if self.use_bundle else None
+        if bundle is None:
+            return None
+        help_text = bundle.get(command)
+        if help_text is not None:
+            logger.info(f"Using bundled help for command: '{command}'")
+        return help_text
 
     def _run(self, command: str) -> str:
         """Use the tool synchronously."""
+        bundled = self._bundled_help(command)
+        if bundled is not None:
+            return bundled
         logger.info(f"Running synchronous help lookup for command: '{command}'")
         try:
             command_parts = shlex.split(command)
@@ -56,6 +73,10 @@ class CommandHelpTool(BaseTool):
 
     async def _arun(self, command: str) -> str:
         """Use the tool asynchronously."""
+        # The bundle check hashes the executable, which would block the event loop.
+        bundled = await asyncio.to_thread(self._bundled_help, command)
+        if bundled is not None:
+            return bundled
         logger.info(f"Running asynchronous help lookup for command: '{command}'")
         try:
             command_parts = shlex.split(command)
@@ -0,0 +1,265 @@
+import os
+import json
+import math
+import time
+import heapq
+import atexit
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .common import aiz_home, tokenize
+
+logger = logging.getLogger(__name__)
+
+# 2: queries are tokenized like the PATH index (see common.tokenize).
+INDEX_FORMAT_VERSION = 2
+JOURNAL_FILENAME = "journal.jsonl"
+INDEX_FILENAME = "journal.idx"
+
+# Frecency: every use counts, but its weight halves every two weeks.
+RECENCY_HALF_LIFE_S = 14 * 24 * 3600
+# Only this many of the most frecent commands per query word are scored, which
+# keeps retrieval sub-millisecond however large the journal grows.
+POSTINGS_SCAN_LIMIT = 64
+# Rewriting the whole index on every approval gets slow as the journal grows,
+# so it is persisted after this many new entries or seconds, and on exit.
+# Whatever was not persisted is re-indexed from the journal tail on load.
+INDEX_SAVE_EVERY = 100
+INDEX_SAVE_INTERVAL_S = 300
+
+@dataclass
+class JournalEntry:
+    """One approved command as written to the journal."""
+    query: str
+    tool: str
+    version: Optional[str]
+    command: str
+    exit_status: int
+    duration: float
+    timestamp: float
+
+
+@dataclass
+class IndexedCommand:
+    """A distinct successful command, aggregated over all its journal entries."""
+    tool: str
+    command: str
+    query: str
+    count: int
+    last_used: float
+
+    def frecency(self, now: float) -> float:
+        age = max(now - self.last_used, 0.0)
+        return self.count * math.pow(0.5, age / RECENCY_HALF_LIFE_S)
+
+    @property
+    def rank(self) -> float:
+        """
+        log(frecency) up to a term that only depends on the current time, so
+        ordering by it never goes stale and postings can be kept pre-sorted.
+        """
+        return math.log(self.count) + self.last_used * math.log(2) / RECENCY_HALF_LIFE_S
+
+
+class CommandJournal:
+    """
+    An append-only local journal of approved commands with a compact index of
+    the distinct successful ones. The index maps query tokens to commands, so
+    retrieval only scores the few commands that share a token with the query.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        """
+        Args:
+            directory: Where the journal and its index are stored.
+                       Defaults to $AIZ_HOME or ~/.aiz.
+        """
+        self.directory = Path(directory) if directory else aiz_home()
+        self.journal_path = self.directory / JOURNAL_FILENAME
+        self.index_path = self.directory / INDEX_FILENAME
+        self._lock = threading.Lock()
+        self._commands: List[IndexedCommand] = []
+        self._by_key: Dict[tuple, int] = {}
+        # Query word -> ids of commands it appears in, most frecent first.
+        self._postings: Dict[str, List[int]] = {}
+        # Command id -> the query words it is posted under.
+        self._tokens: List[set] = []
+        self._unsorted: set = set()
+        self._indexed_size = 0
+        self._loaded = False
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _load(self) -> None:
+        """Loads the on-disk index and indexes any journal tail it has not seen."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.index_path.read_text())
+            if data.get("format") == INDEX_FORMAT_VERSION:
+                for row in data["commands"]:
+                    self._add_command(IndexedCommand(*row), index_tokens=False)
+                for token, ids in data["postings"].items():
+                    # dict.fromkeys drops repeats that older indexes could contain.
+                    ids = list(dict.fromkeys(ids))
+                    self._postings[token] = ids
+                    for command_id in ids:
+                        self._tokens[command_id].add(token)
+                self._indexed_size = data["journal_size"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            logger.warning(f"Ignoring unreadable journal index, rebuilding: {e}")
+            self._commands, self._by_key, self._postings, self._tokens, self._indexed_size = [], {}, {}, [], 0
+
+        if self.journal_path.exists() and self.journal_path.stat().st_size != self._indexed_size:
+            self._index_journal_tail()
+            self._save_index()
+
+    def _index_journal_tail(self) -> None:
+        size = self.journal_path.stat().st_size
+        if size < self._indexed_size:
+            # The journal was truncated or replaced; start over.
+            self._commands, self._by_key, self._postings, self._tokens, self._indexed_size = [], {}, {}, [], 0
+        with open(self.journal_path, "rb") as journal:
+            journal.seek(self._indexed_size)
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break  # A concurrent writer is mid-append; pick it up next time.
+                self._indexed_size += len(line)
+                self._unsaved += 1
+                try:
+                    self._index_entry(JournalEntry(**json.loads(line)))
+                except (ValueError, TypeError):
+                    logger.warning("Skipping malformed journal line.")
+
+    def _add_command(self, command: IndexedCommand, index_tokens: bool = True) -> int:
+        command_id = len(self._commands)
+        self._commands.append(command)
+        self._by_key[(command.tool, command.command)] = command_id
+        tokens = set(tokenize(f"{command.tool} {command.query}")) if index_tokens else set()
+        self._tokens.append(tokens)
+        for token in tokens:
+            self._postings.setdefault(token, []).append(command_id)
+            self._unsorted.add(token)
+        return command_id
+
+    def _index_entry(self, entry: JournalEntry) -> None:
+        # Without a query there is nothing to match on or to show as an example.
+        if entry.exit_status != 0 or not entry.query.strip():
+            return
+        command_id = self._by_key.get((entry.tool, entry.command))
+        if command_id is None:
+            self._add_command(IndexedCommand(entry.tool, entry.command, entry.query, 1, entry.timestamp))
+            return
+        indexed = self._commands[command_id]
+        indexed.count += 1
+        indexed.last_used = max(indexed.last_used, entry.timestamp)
+        # A command approved under several wordings is posted under all of
+        # them, but only once per word.
+        tokens = self._tokens[command_id]
+        for token in set(tokenize(entry.query)) - tokens:
+            self._postings.setdefault(token, []).append(command_id)
+            tokens.add(token)
+        # Its rank went up, so the postings it sits in may be out of order.
+        self._unsorted.update(tokens)
+        indexed.query = entry.query
+
+    def _sort_postings(self) -> None:
+        for token in self._unsorted:
+            ids = self._postings.get(token)
+            if ids:
+                ids.sort(key=lambda command_id: self._commands[command_id].rank, reverse=True)
+        self._unsorted.clear()
+
+    def _save_index(self) -> None:
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._sort_postings()
+        data = {
+            "format": INDEX_FORMAT_VERSION,
+            "journal_size": self._indexed_size,
+            "commands": [
+                [c.tool, c.command, c.query, c.count, c.last_used] for c in self._commands
+            ],
+            "postings": self._postings,
+        }
+        temporary = self.index_path.with_suffix(".tmp")
+        try:
+            temporary.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(temporary, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not write journal index: {e}")
+
+    def record(
+        self,
+        query: str,
+        tool: str,
+        version: Optional[str],
+        command: str,
+        exit_status: int,
+        duration: float,
+    ) -> JournalEntry:
+        """Appends one executed command to the journal and updates the index."""
+        entry = JournalEntry(query, tool, version, command, exit_status, duration, time.time())
+        with self._lock:
+            self._load()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(asdict(entry)) + "\n")
+            self._index_journal_tail()
+            if self._unsaved >= INDEX_SAVE_EVERY or time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL_S:
+                self._save_index()
+        return entry
+
+    def flush(self) -> None:
+        """Persists the index if it has entries that are not on disk yet."""
+        with self._lock:
+            if self._loaded and self._unsaved:
+                self._save_index()
+
+    def similar(self, query: str, limit: int = 3) -> List[IndexedCommand]:
+        """
+        Returns up to `limit` past successful commands whose queries share
+        words with `query`, ranked by word overlap weighted by frecency.
+        """
+        with self._lock:
+            self._load()
+            if not self._commands:
+                return []
+
+            self._sort_postings()
+            overlap: Dict[int, float] = {}
+            for token in set(tokenize(query)):
+                ids = self._postings.get(token)
+                if not ids:
+                    continue
+                # Rare words say more about the query than common ones.
+                weight = math.log(1 + len(self._commands) / len(ids))
+                for command_id in ids[:POSTINGS_SCAN_LIMIT]:
+                    overlap[command_id] = overlap.get(command_id, 0.0) + weight
+
+            now = time.time()
+            best = heapq.nlargest(
+                limit,
+                overlap.items(),
+                key=lambda item: item[1] * (1 + self._commands[item[0]].frecency(now)),
+            )
+            return [self._commands[command_id] for command_id, _ in best]
+
+
+def format_examples(examples: List[IndexedCommand]) -> List[tuple]:
+    """Turns retrieved commands into alternating user/assistant few-shot messages."""
+    messages = []
+    for example in examples:
+        # Model APIs reject empty text turns.
+        if not example.query.strip() or not example.command.strip():
+            continue
+        messages.append(("user", example.query))
+        messages.append(("assistant", example.command))
+    return messages
@@ -0,0 +1,442 @@
+import os
+import re
+import shlex
+import shutil
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from .command_helper import CommandHelpTool
+from .man_pages import find_man_page
+
+logger = logging.getLogger(__name__)
+
+# Arity of an option as advertised by the help text.
+NO_VALUE = "none"
+REQUIRED_VALUE = "required"
+OPTIONAL_VALUE = "optional"
+
+# Tokens that end one command and start the next.
+COMMAND_SEPARATORS = {"|", "||", "&", "&&", ";", ";;", "(", ")", "|&"}
+# Redirections stay within their command; the token after one is its target.
+REDIRECTIONS = {"<", ">", ">>", ">|", "<>", "<<", "<<<", ">&", "<&", "&>", "&>>"}
+SHELL_BUILTINS = {"cd", "export", "source", ".", "alias", "unset", "set", "eval", "exec", "ulimit", "umask"}
+COMMAND_PREFIXES = {"sudo", "env", "time", "nice", "nohup"}
+
+OPTION_PATTERN = re.compile(
+    r"(?<![\w-])(--?[A-Za-z0-9?][\w-]*)"
+    r"(?:(\[=?)(?:<[^>]+>|[A-Z][A-Z0-9_-]*|\{[^}]+\})(?:[:,]?<[^>]+>|\[[^\]]*\])*\]"
+    r"|[= ](<[^>]+>|[A-Z][A-Z0-9_]*\b|\{[^}]+\}))?"
+)
+ALIAS_PATTERN = re.compile(r"(?<![\w-])(-[A-Za-z0-9?]),\s+(--[\w-]+)")
+# A described entry of a command listing, e.g. `   commit    Record changes`.
+SUBCOMMAND_PATTERN = re.compile(r"^\s{2,}([a-z][a-z0-9_-]*)(?:,\s*[a-z][\w-]*)*\s{2,}\S")
+# A section heading such as `Commands:` or `COMMANDS`. Subcommands are only
+# read under headings that mention commands, so value lists (`FORMAT is one
+# of the following:`, `Each CONV symbol may be:`) are not mistaken for them.
+HEADING_PATTERN = re.compile(r"^ ?\S.*:\s*$|^[A-Z][A-Z ]+$")
+ASSIGNMENT_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+NUMERIC_PATTERN = re.compile(r"^-\d+$")
+# The file descriptor of `2>file` or `2>&1`: digits written against the operator.
+FD_PREFIX_PATTERN = re.compile(r"(^|\s)\d+(?=[<>])")
+SUBCOMMAND_WORD_PATTERN = re.compile(r"^[a-z][a-z0-9_-]*$")
+# Help texts that say they only list some of the options.
+ABRIDGED_PATTERN = re.compile(
+    r"not the full help|--help all|for (?:all|more) options|this (?:list|menu) is (?:not complete|incomplete)",
+    re.IGNORECASE,
+)
+ERROR_PREFIXES = ("Error:", "Error executing command", "An unexpected error occurred")
+
+HelpLookup = Callable[[str], Optional[str]]
+AsyncHelpLookup = Callable[[str], Union[Optional[str], Awaitable[Optional[str]]]]
+
+
+@dataclass
+class HelpSpec:
+    """The options and subcommands extracted from a single help text."""
+    options: Dict[str, str] = field(default_factory=dict)
+    subcommands: set = field(default_factory=set)
+    # The help says it lists only some options (e.g. curl's short --help).
+    abridged: bool = False
+
+    def accepts(self, flag: str) -> bool:
+        return flag in self.options
+
+
+def parse_help(help_text: str) -> HelpSpec:
+    """
+    Extracts option names, their arity and the listed subcommands from a
+    `--help` style text. An option is recorded as taking a value if any of its
+    occurrences (usage line or option table) shows a value placeholder, and
+    as taking an optional one if any occurrence shows it in brackets, since
+    manuals often list `--opt` and `--opt=<value>` as separate forms.
+    """
+    spec = HelpSpec(abridged=bool(ABRIDGED_PATTERN.search(help_text)))
+    strength = {NO_VALUE: 0, REQUIRED_VALUE: 1, OPTIONAL_VALUE: 2}
+    for match in OPTION_PATTERN.finditer(help_text):
+        flag, optional_marker, value = match.group(1), match.group(2), match.group(3)
+        if optional_marker is not None:
+            arity = OPTIONAL_VALUE
+        elif value is not None:
+            arity = REQUIRED_VALUE
+        else:
+            arity = NO_VALUE
+        if strength[arity] > strength[spec.options.get(flag, NO_VALUE)] or flag not in spec.options:
+            spec.options[flag] = arity
+
+    # Option tables often show the value only on the long form: `-f, --file=ARCHIVE`.
+    for short, long in ALIAS_PATTERN.findall(help_text):
+        if spec.options.get(short) == NO_VALUE and spec.options.get(long, NO_VALUE) != NO_VALUE:
+            spec.options[short] = spec.options[long]
+
+    in_command_listing = False
+    for line in help_text.splitlines():
+        if HEADING_PATTERN.match(line):
+            in_command_listing = "command" in line.lower()
+            continue
+        match = SUBCOMMAND_PATTERN.match(line) if in_command_listing else None
+        if match:
+            spec.subcommands.add(match.group(1))
+    return spec
+
+
+def split_segments(command: str) -> List[List[str]]:
+    """
+    Tokenizes a shell command and splits it on pipes and command separators.
+    Redirections (`> out`, `2>&1`, `< in`) are dropped along with their
+    target, so only the words each program actually receives remain.
+    """
+    lexer = shlex.shlex(FD_PREFIX_PATTERN.sub(r"\1", command), posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    tokens = list(lexer)
+    segments: List[List[str]] = [[]]
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+        if token in COMMAND_SEPARATORS:
+            segments.append([])
+        elif token in REDIRECTIONS:
+            index += 1
+        else:
+            segments[-1].append(token)
+    return [segment for segment in segments if segment]
+
+
+def primary_tool(command: str) -> Optional[str]:
+    """Returns the program a command line runs, skipping env assignments and `sudo`-like prefixes."""
+    try:
+        segments = split_segments(command)
+    except ValueError:
+        return None
+    tokens = segments[0] if segments else []
+    while tokens and (ASSIGNMENT_PATTERN.match(tokens[0]) or tokens[0] in COMMAND_PREFIXES):
+        tokens = tokens[1:]
+    return tokens[0] if tokens else None
+
+
+def _error_free(text: Optional[str]) -> Optional[str]:
+    if not text or text.startswith(ERROR_PREFIXES):
+        return None
+    return text
+
+
+# (command, executable, mtime, size) -> help text. The executable's path,
+# mtime and size stand in for the installed version, so an upgrade
+# invalidates the cached help automatically.
+_LIVE_HELP_CACHE: Dict[tuple, Optional[str]] = {}
+_LIVE_HELP_CACHE_SIZE = 256
+
+
+def _live_help_key(command: str) -> Optional[tuple]:
+    program = command.split()[0]
+    # `./deploy.sh --help` would run the script itself, before anyone approved it.
+    if "/" in program or os.sep in program:
+        return None
+    executable = shutil.which(program)
+    if executable is None:
+        return None
+    stat = os.stat(executable)
+    return (command, executable, stat.st_mtime_ns, stat.st_size)
+
+
+def _remember_live_help(key: tuple, help_text: Optional[str]) -> Optional[str]:
+    # A failing `--help` often prints an error instead of documentation; treat
+    # output that lists no options as missing so later lookups get a chance.
+    help_text = _error_free(help_text)
+    if help_text and not OPTION_PATTERN.search(help_text):
+        help_text = None
+    if len(_LIVE_HELP_CACHE) >= _LIVE_HELP_CACHE_SIZE:
+        _LIVE_HELP_CACHE.pop(next(iter(_LIVE_HELP_CACHE)))
+    _LIVE_HELP_CACHE[key] = help_text
+    return help_text
+
+
+def live_help_lookup(command: str) -> Optional[str]:
+    """Fetches help for the installed version of a tool, cached per binary."""
+    key = _live_help_key(command)
+    if key is None:
+        return None
+    if key in _LIVE_HELP_CACHE:
+        return _LIVE_HELP_CACHE[key]
+    return _remember_live_help(key, CommandHelpTool()._run(command))
+
+
+async def alive_help_lookup(command: str) -> Optional[str]:
+    """Async version of `live_help_lookup` that runs the subprocess without a thread."""
+    key = _live_help_key(command)
+    if key is None:
+        return None
+    if key in _LIVE_HELP_CACHE:
+        return _LIVE_HELP_CACHE[key]
+    return _remember_live_help(key, await CommandHelpTool()._arun(command))
+
+
+def conversation_help_lookup(messages: Sequence) -> HelpLookup:
+    """
+    Builds a lookup that only returns help already fetched through the
+    `command_help` tool in this conversation. It never spawns a subprocess.
+    """
+    requested: Dict[str, str] = {}
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                if call["name"] == "command_help":
+                    requested[call["id"]] = call["args"].get("command", "")
+
+    fetched: Dict[str, str] = {}
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.tool_call_id in requested:
+            text = _error_free(str(message.content))
+            if text:
+                fetched[" ".join(requested[message.tool_call_id].split())] = text
+    return fetched.get
+
+
+def chain_lookups(*lookups: HelpLookup) -> HelpLookup:
+    """Returns a lookup that tries each lookup in turn until one has help."""
+    def lookup(command: str) -> Optional[str]:
+        for candidate in lookups:
+            help_text = candidate(command)
+            if help_text:
+                return help_text
+        return None
+    return lookup
+
+
+def achain_lookups(*lookups: AsyncHelpLookup) -> Callable[[str], Awaitable[Optional[str]]]:
+    """Like `chain_lookups`, but accepts a mix of sync and async lookups."""
+    async def lookup(command: str) -> Optional[str]:
+        for candidate in lookups:
+            help_text = candidate(command)
+            if inspect.isawaitable(help_text):
+                help_text = await help_text
+            if help_text:
+                return help_text
+        return None
+    return lookup
+
+
+class CommandValidator:
+    """
+    Checks a generated command against the parsed help of the installed tool
+    without calling a model: the tool must exist, every flag must be listed in
+    the help and flags that need a value must get one.
+    """
+
+    def __init__(self, help_lookup: AsyncHelpLookup = live_help_lookup, check_installed: bool = True):
+        """
+        Args:
+            help_lookup: Returns help text for "tool" or "tool subcommand",
+                         or None when no documentation is available. It may be
+                         async, in which case use `avalidate`.
+            check_installed: Report tools that are not found on PATH.
+        """
+        self.help_lookup = help_lookup
+        self.check_installed = check_installed
+        self._specs: Dict[str, Optional[HelpSpec]] = {}
+        self._subcommands: Dict[str, bool] = {}
+
+    def _spec(self, command: str) -> Optional[HelpSpec]:
+        if command not in self._specs:
+            help_text = self.help_lookup(command)
+            if inspect.isawaitable(help_text):
+                help_text.close()
+                raise TypeError(f"Help for `{command}` was not prefetched; use avalidate with an async help lookup.")
+            self._specs[command] = parse_help(help_text) if help_text else None
+        return self._specs[command]
+
+    async def _aspec(self, command: str) -> Optional[HelpSpec]:
+        if command not in self._specs:
+            help_text = self.help_lookup(command)
+            if inspect.isawaitable(help_text):
+                help_text = await help_text
+            self._specs[command] = parse_help(help_text) if help_text else None
+        return self._specs[command]
+
+    async def avalidate(self, command: str) -> List[str]:
+        """
+        Async version of `validate`, for validators built with an async help
+        lookup. The help of every tool in the command, and of the subcommand
+        it runs, is fetched first; validation then only reads parsed specs.
+        """
+        try:
+            segments = split_segments(command)
+        except ValueError:
+            segments = []
+        for tokens in segments:
+            tool, args = self._program(tokens)
+            if tool is None or (self.check_installed and shutil.which(tool) is None):
+                continue
+            spec = await self._aspec(tool)
+            if spec is not None and spec.subcommands:
+                word = self._first_positional(args, spec, tool)
+                if word is not None and await asyncio.to_thread(self._is_subcommand, tool, word, spec):
+                    await self._aspec(f"{tool} {word}")
+        return self.validate(command)
+
+    def validate(self, command: str) -> List[str]:
+        """Returns a list of human-readable problems; empty when the command is valid."""
+        try:
+            segments = split_segments(command)
+        except ValueError as e:
+            return [f"The command could not be parsed: {e}."]
+        if not segments:
+            return ["The command is empty."]
+
+        problems: List[str] = []
+        for tokens in segments:
+            problems.extend(self._validate_segment(tokens))
+        return problems
+
+    @staticmethod
+    def _program(tokens: List[str]) -> tuple[Optional[str], List[str]]:
+        """The program a segment runs and its arguments; None for builtins and bare assignments."""
+        while tokens and (ASSIGNMENT_PATTERN.match(tokens[0]) or tokens[0] in COMMAND_PREFIXES):
+            tokens = tokens[1:]
+        if not tokens or tokens[0] in SHELL_BUILTINS:
+            return None, []
+        return tokens[0], tokens[1:]
+
+    def _first_positional(self, args: List[str], spec: HelpSpec, scope: str) -> Optional[str]:
+        """The first non-flag argument, skipping the values flags consume, as `_validate_segment` walks them."""
+        index = 0
+        while index < len(args):
+            token = args[index]
+            index += 1
+            if token == "--":
+                return None
+            if not token.startswith("-") or token == "-" or NUMERIC_PATTERN.match(token):
+                return token
+            if spec.options and self._check_flag(token, spec, scope, args[index:])[1]:
+                index += 1
+        return None
+
+    def _validate_segment(self, tokens: List[str]) -> List[str]:
+        tool, args = self._program(tokens)
+        if tool is None:
+            return []
+        if self.check_installed and shutil.which(tool) is None:
+            return [f"`{tool}` is not installed on this machine."]
+
+        scope = tool
+        spec = self._spec(tool)
+        problems: List[str] = []
+        subcommand_resolved = False
+        index = 0
+        while index < len(args):
+            token = args[index]
+            index += 1
+            if token == "--":
+                break
+            if not token.startswith("-") or token == "-" or NUMERIC_PATTERN.match(token):
+                if not subcommand_resolved and spec is not None and spec.subcommands:
+                    scope, spec = self._subcommand_spec(tool, token, spec)
+                subcommand_resolved = True
+                continue
+            if spec is None or not spec.options:
+                continue
+
+            problem, consumes_next = self._check_flag(token, spec, scope, args[index:])
+            if problem:
+                problems.append(problem)
+            if consumes_next:
+                index += 1
+        return problems
+
+    def _is_subcommand(self, tool: str, word: str, spec: HelpSpec) -> bool:
+        """
+        Whether `word` is a real subcommand of `tool`: listed in its help, or
+        documented in a `tool-word` man page (`git --help` omits `checkout`).
+        Only then is `tool word --help` worth running.
+        """
+        if word in spec.subcommands:
+            return True
+        if not SUBCOMMAND_WORD_PATTERN.match(word):
+            return False
+        key = f"{tool}-{word}"
+        if key not in self._subcommands:
+            self._subcommands[key] = find_man_page(key) is not None
+        return self._subcommands[key]
+
+    def _subcommand_spec(self, tool: str, word: str, spec: HelpSpec) -> tuple[str, Optional[HelpSpec]]:
+        """
+        Resolves the spec for the first positional of a tool with subcommands.
+        Anything else, e.g. a path, an unlisted subcommand or a subcommand
+        without help, leaves the flags after it unchecked: the parent's
+        options say nothing about them.
+        """
+        if self._is_subcommand(tool, word, spec):
+            scope = f"{tool} {word}"
+            return scope, self._spec(scope)
+        return tool, None
+
+    def _check_flag(self, token: str, spec: HelpSpec, scope: str, rest: List[str]) -> tuple[Optional[str], bool]:
+        """Validates one flag token. Returns (problem, whether the next token is its value)."""
+        flag, has_inline_value = token, False
+        if token.startswith("--") and "=" in token:
+            flag, has_inline_value = token.split("=", 1)[0], True
+
+        if spec.accepts(flag):
+            arity = spec.options[flag]
+            if has_inline_value and arity == NO_VALUE:
+                return f"`{flag}` does not take a value in `{scope}`.", False
+            if arity == REQUIRED_VALUE and not has_inline_value:
+                # Like getopt, a required argument consumes the next token whatever it looks like.
+                if not rest:
+                    return f"`{flag}` requires a value in `{scope}`.", False
+                return None, True
+            return None, False
+
+        if not token.startswith("--") and len(token) > 2:
+            # Grouped short options (`-la`) or a short option with an attached value (`-n5`).
+            for position, letter in enumerate(token[1:], start=1):
+                short = f"-{letter}"
+                if not spec.accepts(short):
+                    break
+                if spec.options[short] != NO_VALUE:
+                    needs_next = position == len(token) - 1 and spec.options[short] == REQUIRED_VALUE
+                    if needs_next and not rest:
+                        return f"`{short}` requires a value in `{scope}`.", False
+                    return None, needs_next
+            else:
+                return None, False
+
+        if spec.abridged:
+            # The help says it leaves options out, so a missing one proves nothing.
+            return None, False
+        return f"`{flag}` is not a documented option of `{scope}`.", False
+
+
+def format_correction(command: str, problems: Sequence[str]) -> str:
+    """Builds the correction message sent back to the generator."""
+    issues = "\n".join(f"- {problem}" for problem in problems)
+    return (
+        f"The command `{command}` failed validation against the installed help:\n"
+        f"{issues}\n"
+        "Fix these problems and answer again with only the corrected command."
+    )
@@ -0,0 +1,24 @@
+import os
+import re
+from pathlib import Path
+from typing import List
+
+AIZ_HOME_ENV_VAR = "AIZ_HOME"
+
+# Lowercase words, keeping the characters tool names use (g++, python3.12, ssh-keygen).
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_.+-]*")
+STOP_WORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "and", "or", "with", "my", "me",
+    "i", "it", "is", "how", "do", "can", "you", "what", "this", "that", "all", "from",
+}
+
+
+def aiz_home() -> Path:
+    """Where aiz keeps its caches, journal and help bundle: $AIZ_HOME, defaulting to ~/.aiz."""
+    return Path(os.environ.get(AIZ_HOME_ENV_VAR, Path.home() / ".aiz"))
+
+
+def tokenize(text: str) -> List[str]:
+    """The lowercase words of a request without stop words or trailing punctuation ("files." -> "files")."""
+    tokens = (token.rstrip(".-") for token in TOKEN_PATTERN.findall(text.lower()))
+    return [token for token in tokens if token and token not in STOP_WORDS]
@@ -0,0 +1,233 @@
+import os
+import sys
+import mmap
+import json
+import zlib
+import struct
+import shutil
+import hashlib
+import logging
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .common import aiz_home
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"AIZHELP\0"
+BUNDLE_FORMAT_VERSION = 1
+# magic, format version, reserved, entry count, index offset, index length
+HEADER = struct.Struct("<8sHHIQQ")
+# Bytes hashed from each end of an executable to fingerprint the installed build.
+FINGERPRINT_SAMPLE = 256 * 1024
+BUNDLE_ENV_VAR = "AIZ_HELP_BUNDLE"
+BUNDLE_FILENAME = "help.bundle"
+
+
+class HelpBundleError(Exception):
+    pass
+
+
+@lru_cache(maxsize=512)
+def _fingerprint(executable: str, mtime_ns: int, size: int) -> Optional[str]:
+    digest = hashlib.sha256(str(size).encode())
+    with open(executable, "rb") as binary:
+        head = binary.read(FINGERPRINT_SAMPLE)
+        if head.startswith(b"#!"):
+            return None
+        digest.update(head)
+        if size > 2 * FINGERPRINT_SAMPLE:
+            binary.seek(-FINGERPRINT_SAMPLE, os.SEEK_END)
+            digest.update(binary.read())
+    return digest.hexdigest()[:32]
+
+
+def tool_fingerprint(tool: str) -> Optional[str]:
+    """
+    Identifies the installed build of a tool without running it: a hash of the
+    executable's size and of its first and last bytes. Identical builds match
+    across machines; any upgrade changes the fingerprint. Returns None if the
+    tool is not on PATH or is a script: wrappers such as pyenv shims and Python
+    entry points are byte-identical across the versions they launch, so they
+    cannot be fingerprinted and are never bundled.
+    """
+    executable = shutil.which(tool)
+    if executable is None:
+        return None
+    executable = os.path.realpath(executable)
+    stat = os.stat(executable)
+    return _fingerprint(executable, stat.st_mtime_ns, stat.st_size)
+
+
+class HelpBundle:
+    """
+    A read-only, memory-mapped snapshot of help texts.
+
+    The file is a fixed header, the zlib-compressed help texts back to back,
+    and a JSON index of (command, tool, fingerprint, version, offset, length).
+    Opening a bundle only reads the header and the index; each help text is
+    sliced out of the mapping and decompressed when it is asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as bundle:
+            self._map = mmap.mmap(bundle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            raise HelpBundleError(f"'{path}' is too small to be a help bundle.")
+        magic, version, _, count, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != BUNDLE_MAGIC:
+            raise HelpBundleError(f"'{path}' is not a help bundle.")
+        if version > BUNDLE_FORMAT_VERSION:
+            raise HelpBundleError(
+                f"'{path}' uses bundle format {version}; this version of aiz reads up to {BUNDLE_FORMAT_VERSION}."
+            )
+
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        if len(index) != count:
+            raise HelpBundleError(f"'{path}' is corrupt: expected {count} entries, found {len(index)}.")
+        self.entries: Dict[str, dict] = {entry["command"]: entry for entry in index}
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _read(self, entry: dict) -> str:
+        start = entry["offset"]
+        return zlib.decompress(self._map[start:start + entry["length"]]).decode("utf-8")
+
+    def get(self, command: str) -> Optional[str]:
+        """
+        Returns the bundled help for `command` if the installed tool is the
+        same build the bundle was made from, otherwise None.
+        """
+        entry = self.entries.get(" ".join(command.split()))
+        if entry is None:
+            return None
+        if tool_fingerprint(entry["tool"]) != entry["fingerprint"]:
+            logger.info(f"Bundled help for '{command}' is for a different version; using live lookup.")
+            return None
+        return self._read(entry)
+
+    @staticmethod
+    def write(path: str, entries: Iterable[dict]) -> int:
+        """
+        Writes a bundle. Each entry needs 'command', 'tool', 'fingerprint',
+        'version' and 'help'. Returns the number of entries written.
+        """
+        index: List[dict] = []
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as bundle:
+            bundle.write(b"\0" * HEADER.size)
+            for entry in entries:
+                data = zlib.compress(entry["help"].encode("utf-8"), 9)
+                index.append({
+                    "command": " ".join(entry["command"].split()),
+                    "tool": entry["tool"],
+                    "fingerprint": entry["fingerprint"],
+                    "version": entry["version"],
+                    "offset": bundle.tell(),
+                    "length": len(data),
+                })
+                bundle.write(data)
+
+            index_data = json.dumps(index, separators=(",", ":")).encode("utf-8")
+            index_offset = bundle.tell()
+            bundle.write(index_data)
+            bundle.seek(0)
+            bundle.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, 0, len(index), index_offset, len(index_data)))
+        os.replace(temporary, path)
+        return len(index)
+
+    @classmethod
+    def export(cls, path: str, commands: Iterable[str]) -> int:
+        """
+        Collects live help for each command ("tool" or "tool subcommand") on
+        this machine and writes it to a bundle. Commands whose tool is not
+        installed, is a script, or whose help output lists no options are
+        skipped.
+        """
+        # Imported here: CommandHelpTool itself consults bundles.
+        from .command_helper import CommandHelpTool
+        from .command_validator import OPTION_PATTERN
+        from .installed_tools import installed_version
+
+        def collect():
+            helper = CommandHelpTool(use_bundle=False)
+            for command in commands:
+                tool = command.split()[0]
+                if shutil.which(tool) is None:
+                    logger.warning(f"Skipping '{command}': '{tool}' is not installed.")
+                    continue
+                fingerprint = tool_fingerprint(tool)
+                if fingerprint is None:
+                    logger.warning(f"Skipping '{command}': '{tool}' is a script and cannot be fingerprinted.")
+                    continue
+                help_text = helper._run(command)
+                if help_text.startswith("Error") or not OPTION_PATTERN.search(help_text):
+                    logger.warning(f"Skipping '{command}': no usable help output.")
+                    continue
+                yield {
+                    "command": command,
+                    "tool": tool,
+                    "fingerprint": fingerprint,
+                    "version": installed_version(tool),
+                    "help": help_text,
+                }
+
+        return cls.write(path, collect())
+
+
+def default_bundle_path() -> Optional[Path]:
+    """$AIZ_HELP_BUNDLE, else help.bundle in `aiz_home()`, if it exists."""
+    configured = os.environ.get(BUNDLE_ENV_VAR)
+    if configured:
+        return Path(configured)
+    path = aiz_home() / BUNDLE_FILENAME
+    return path if path.exists() else None
+
+
+_default_bundle: Dict[str, Optional[HelpBundle]] = {}
+
+
+def default_help_bundle() -> Optional[HelpBundle]:
+    """The bundle at `default_bundle_path()`, opened once per process."""
+    path = default_bundle_path()
+    if path is None:
+        return None
+    key = str(path)
+    if key not in _default_bundle:
+        try:
+            _default_bundle[key] = HelpBundle(key)
+        except (OSError, ValueError, HelpBundleError) as e:
+            logger.warning(f"Ignoring help bundle '{key}': {e}")
+            _default_bundle[key] = None
+    return _default_bundle[key]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m aiz.tools.help_bundle", description="Export or inspect help bundles.")
+    subcommands = parser.add_subparsers(dest="action", required=True)
+    export_parser = subcommands.add_parser("export", help="Collect help for commands into a bundle.")
+    export_parser.add_argument("path")
+    export_parser.add_argument("commands", nargs="+", help="Commands such as 'git' or 'git commit'.")
+    inspect_parser = subcommands.add_parser("inspect", help="List a bundle's entries and whether they match this machine.")
+    inspect_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.action == "export":
+        written = HelpBundle.export(args.path, args.commands)
+        print(f"Wrote {written} help entries to {args.path}")
+        return 0
+
+    bundle = HelpBundle(args.path)
+    for command, entry in sorted(bundle.entries.items()):
+        status = "match" if tool_fingerprint(entry["tool"]) == entry["fingerprint"] else "mismatch"
+        print(f"{command:30} {status:9} {entry['version']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
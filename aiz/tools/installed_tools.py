@@ -0,0 +1,63 @@
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import Optional
+
+from .help_bundle import default_help_bundle, tool_fingerprint
+
+
+@lru_cache(maxsize=256)
+def _version_of(executable: str, mtime_ns: int, size: int) -> str:
+    # Keyed on the binary's mtime and size so an upgrade is picked up.
+    try:
+        result = subprocess.run(
+            [executable, "--version"],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    output = (result.stdout or result.stderr).strip()
+    return output.splitlines()[0] if output else "unknown"
+
+
+def _is_path(program: str) -> bool:
+    return "/" in program or os.sep in program
+
+
+def installed_version(tool: str) -> Optional[str]:
+    """
+    Returns the first line of `<tool> --version` for the installed binary,
+    "unknown" if the tool does not report one, or None if it is not on PATH.
+    This runs the tool, so only call it for tools the user chose to inspect;
+    path-qualified programs (`./deploy.sh`) are never run.
+    """
+    if _is_path(tool):
+        return None
+    executable = shutil.which(tool)
+    if executable is None:
+        return None
+    stat = os.stat(executable)
+    return _version_of(executable, stat.st_mtime_ns, stat.st_size)
+
+
+def known_version(tool: str) -> Optional[str]:
+    """
+    Identifies the installed version of a tool without running it: the
+    `--version` line stored in the help bundle when the bundle matches the
+    installed build, otherwise the build fingerprint. None for tools that
+    are not on PATH, for scripts (see `tool_fingerprint`) and for
+    path-qualified programs.
+    """
+    if _is_path(tool):
+        return None
+    fingerprint = tool_fingerprint(tool)
+    if fingerprint is None:
+        return None
+    bundle = default_help_bundle()
+    entry = bundle.entries.get(tool) if bundle is not None else None
+    if entry is not None and entry["fingerprint"] == fingerprint and entry.get("version"):
+        return entry["version"]
+    return f"build {fingerprint[:12]}"
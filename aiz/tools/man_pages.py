@@ -0,0 +1,456 @@
+import os
+import re
+import bz2
+import glob
+import gzip
+import lzma
+import zlib
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Type
+
+from pydantic import BaseModel, Field
+from langchain.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAN_DIRS = ["/usr/local/share/man", "/usr/share/man", "/usr/man", "/opt/homebrew/share/man"]
+DEFAULT_MAN_SECTIONS = ("1", "8", "6")
+COMPRESSED_OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".lzma": lzma.open, ".bz2": bz2.open}
+# Raised by a dangling link, a truncated archive or corrupt compressed data.
+READ_ERRORS = (OSError, EOFError, lzma.LZMAError, zlib.error)
+# Sections to fall back to when a page has no section of the requested name.
+SECTION_FALLBACKS = {
+    "OPTIONS": ["COMMAND OPTIONS", "DESCRIPTION"],
+    "EXAMPLES": ["EXAMPLE", "USAGE"],
+}
+MAX_SECTION_CHARS = 24000
+
+SPECIAL_CHARACTERS = {
+    "em": "--", "en": "-", "hy": "-", "mi": "-", "aq": "'", "dq": '"', "bu": "*",
+    "lq": '"', "rq": '"', "oq": "'", "cq": "'", "ti": "~", "ha": "^", "pl": "+",
+    "bv": "|", "ba": "|", "co": "(c)", "rg": "(R)", "tm": "(TM)", "Tm": "(TM)",
+    "R": "(R)", "ga": "`", "aa": "'", "la": "<", "ra": ">", "lB": "[", "rB": "]",
+    "lC": "{", "rC": "}", ">=": ">=", "<=": "<=", "->": "->", "<-": "<-", "mu": "x",
+}
+
+ESCAPE_PATTERN = re.compile(
+    r"\\(?:"
+    r"f(?:\[[^\]]*\]|\(..|.)"               # font changes
+    r"|\((?P<special2>..)"                  # \(xx special character
+    r"|\[(?P<special>[^\]]*)\]"             # \[name] special character
+    r"|\*(?:\((?P<string2>..)|\[(?P<string>[^\]]*)\]|(?P<string1>.))"  # strings
+    r"|[nk](?:\(..|\[[^\]]*\]|.)"           # number registers / marks
+    r"|s[+-]?(?:\d+|\[[^\]]*\]|\(\d\d)"     # point size
+    r"|[hvwlLXDoNbxRZ](?P<q>.).*?(?P=q)"    # quoted-argument escapes
+    r"|m(?:\[[^\]]*\]|\(..|.)"              # colours
+    r"|(?P<char>.)"
+    r")"
+)
+MACRO_ARG_PATTERN = re.compile(r'"((?:[^"]|"")*)"?|(\S+)')
+SIMPLE_ESCAPES = {"-": "-", "e": "\\", "\\": "\\", " ": " ", "~": " ", "0": " ", ".": ".",
+                  "'": "'", "`": "`", "t": "\t"}
+
+# mdoc macros whose argument is rendered with decoration; others just drop the macro name.
+MDOC_CALLABLE = {
+    "Ad", "Ar", "Cm", "Dv", "Em", "Er", "Ev", "Fa", "Fl", "Fn", "Ic", "Li", "Nm", "No", "Ns",
+    "Op", "Pa", "Ql", "Sy", "Va", "Xr", "Dq", "Qq", "Sq", "Pq", "Aq", "Oo", "Oc", "Bq", "Brq",
+}
+TRAILING_PUNCTUATION = {".", ",", ";", ":", ")", "]", "?", "!"}
+
+
+def man_directories() -> List[str]:
+    """
+    Returns the man page roots in lookup order, following MANPATH (an empty
+    component stands for the defaults) or, when unset, the directories next
+    to each PATH entry, the way `manpath` derives them.
+    """
+    manpath = os.environ.get("MANPATH")
+    if manpath:
+        directories: List[str] = []
+        for part in manpath.split(os.pathsep):
+            directories.extend(DEFAULT_MAN_DIRS if part == "" else [part])
+    else:
+        directories = []
+        for bin_dir in os.environ.get("PATH", "").split(os.pathsep):
+            prefix = os.path.dirname(bin_dir.rstrip(os.sep))
+            directories.extend([os.path.join(prefix, "share", "man"), os.path.join(prefix, "man")])
+        directories.extend(DEFAULT_MAN_DIRS)
+
+    seen, unique = set(), []
+    for directory in directories:
+        if directory not in seen and os.path.isdir(directory):
+            seen.add(directory)
+            unique.append(directory)
+    return unique
+
+
+def find_man_page(name: str, sections: Sequence[str] = DEFAULT_MAN_SECTIONS) -> Optional[str]:
+    """Returns the path of the first man page for `name`, or None."""
+    for directory in man_directories():
+        for section in sections:
+            candidates = glob.glob(os.path.join(directory, f"man{section}", f"{glob.escape(name)}.{section}*"))
+            if candidates:
+                # Prefer the plain section (tar.1) over suffixed variants (tar.1ssl).
+                return min(candidates, key=len)
+    return None
+
+
+def _open_text(path: str):
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, "rt", encoding="utf-8", errors="replace")
+
+
+def iter_roff_lines(path: str) -> Iterator[str]:
+    """Streams the decompressed lines of a man page, following one `.so` redirect."""
+    with _open_text(path) as page:
+        for line in page:
+            if line.startswith(".so "):
+                target = line[4:].strip()
+                root = os.path.dirname(os.path.dirname(path))
+                redirected = glob.glob(os.path.join(root, glob.escape(target)) + "*")
+                if redirected:
+                    yield from iter_roff_lines(redirected[0])
+                    return
+                continue
+            yield line.rstrip("\n")
+
+
+def strip_escapes(text: str) -> str:
+    """Replaces roff escape sequences with their plain-text equivalents."""
+    comment = text.find('\\"')
+    if comment != -1:
+        text = text[:comment]
+
+    def replace(match: "re.Match") -> str:
+        groups = match.groupdict()
+        name = groups["special2"] or groups["special"] or groups["string2"] or groups["string"] or groups["string1"]
+        if name is not None:
+            return SPECIAL_CHARACTERS.get(name, "")
+        if groups["char"] is not None:
+            return SIMPLE_ESCAPES.get(groups["char"], "")
+        return ""
+
+    return ESCAPE_PATTERN.sub(replace, text)
+
+
+def split_macro_args(text: str) -> List[str]:
+    """Splits macro arguments, honouring roff double quotes."""
+    return [match.group(1).replace('""', '"') if match.group(1) is not None else match.group(2)
+            for match in MACRO_ARG_PATTERN.finditer(text)]
+
+
+class _Renderer:
+    """Turns man(7) and mdoc(7) requests into indented plain text."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.buffer: List[str] = []
+        self.indent = 0
+        self.body_indent = 0
+        self.nofill = False
+        self.tag_next = False
+        self.name = ""
+
+    def _emit(self, text: str, indent: int) -> None:
+        if text or (self.lines and self.lines[-1]):
+            self.lines.append(" " * indent + text if text else "")
+
+    def flush(self) -> None:
+        if self.buffer:
+            self._emit(" ".join(self.buffer), self.indent + self.body_indent)
+            self.buffer = []
+
+    def paragraph(self, reset_indent: bool = True) -> None:
+        self.flush()
+        self._emit("", 0)
+        if reset_indent:
+            self.body_indent = 0
+
+    def text(self, text: str) -> None:
+        if self.tag_next:
+            self.flush()
+            self._emit(text, self.indent)
+            self.tag_next = False
+            self.body_indent = 7
+        elif self.nofill:
+            self._emit(text, self.indent + self.body_indent)
+        elif text:
+            self.buffer.append(text)
+        else:
+            self.paragraph(reset_indent=False)
+
+    def heading(self, text: str, indent: int = 0) -> None:
+        self.paragraph()
+        self._emit(text, indent)
+        self.indent = 0 if indent == 0 else indent
+
+    def _mdoc_inline(self, args: List[str]) -> str:
+        out: List[str] = []
+        glue = False
+        index = 0
+        while index < len(args):
+            token = args[index]
+            index += 1
+            if token in MDOC_CALLABLE:
+                if token == "Ns":
+                    glue = True
+                    continue
+                if token == "Fl":
+                    following = args[index] if index < len(args) else ""
+                    if following and following not in MDOC_CALLABLE and following not in TRAILING_PUNCTUATION:
+                        index += 1
+                        piece = "-" + following
+                    else:
+                        piece = "-"
+                    glue = glue or (out and out[-1].endswith(("[", "-")))
+                elif token == "Nm" and (index >= len(args) or args[index] in MDOC_CALLABLE):
+                    piece = self.name
+                elif token == "Xr" and index + 1 < len(args):
+                    piece = f"{args[index]}({args[index + 1]})"
+                    index += 2
+                elif token in ("Op", "Bq"):
+                    piece = "[" + self._mdoc_inline(args[index:]) + "]"
+                    index = len(args)
+                elif token in ("Dq", "Qq"):
+                    piece = '"' + self._mdoc_inline(args[index:]) + '"'
+                    index = len(args)
+                elif token in ("Sq", "Ql"):
+                    piece = "'" + self._mdoc_inline(args[index:]) + "'"
+                    index = len(args)
+                elif token in ("Pq", "Aq"):
+                    piece = "(" + self._mdoc_inline(args[index:]) + ")"
+                    index = len(args)
+                elif token == "Oo":
+                    out.append("[")
+                    glue = True
+                    continue
+                elif token == "Oc":
+                    piece, glue = "]", True
+                else:
+                    continue
+            else:
+                piece = token
+                glue = glue or token in TRAILING_PUNCTUATION
+            if glue and out:
+                out[-1] += piece
+            else:
+                out.append(piece)
+            glue = piece == "["
+        return " ".join(out)
+
+    def request(self, macro: str, raw_args: str) -> None:
+        args = split_macro_args(strip_escapes(raw_args))
+
+        # man(7)
+        if macro in ("SH", "Sh"):
+            self.heading(" ".join(args).upper())
+        elif macro in ("SS", "Ss"):
+            self.heading(" ".join(args), indent=3)
+        elif macro in ("PP", "P", "LP", "Pp", "Lp", "sp"):
+            self.paragraph()
+        elif macro in ("br",):
+            self.flush()
+        elif macro == "TP":
+            self.paragraph()
+            self.tag_next = True
+        elif macro in ("IP", "It"):
+            self.paragraph()
+            tag = self._mdoc_inline(args) if macro == "It" else (args[0] if args else "")
+            if tag:
+                self._emit(tag, self.indent)
+            self.body_indent = 7
+        elif macro == "RS":
+            self.flush()
+            self.indent += 4
+        elif macro == "RE":
+            self.flush()
+            self.indent = max(self.indent - 4, 0)
+        elif macro in ("nf", "EX", "Bd"):
+            self.flush()
+            self.nofill = True
+        elif macro in ("fi", "EE", "Ed"):
+            self.nofill = False
+        elif macro in ("B", "I", "SM", "SB", "UR", "MT"):
+            self.text(" ".join(args))
+        elif macro in ("BR", "BI", "IB", "IR", "RB", "RI"):
+            self.text("".join(args))
+        elif macro == "OP":
+            self.text("[" + " ".join(args) + "]")
+        # mdoc(7)
+        elif macro == "Nm":
+            if args and not self.name:
+                self.name = args[0]
+            self.text(self._mdoc_inline(["Nm"] + args) if not args else self._mdoc_inline(args))
+        elif macro == "Nd":
+            self.text("-- " + " ".join(args))
+        elif macro == "Dl":
+            self.flush()
+            self._emit(self._mdoc_inline(args), self.indent + self.body_indent + 4)
+        elif macro in MDOC_CALLABLE:
+            self.text(self._mdoc_inline([macro] + args))
+        # Everything else (TH, Dd, Dt, Os, Bl, El, ds, ...) carries no text.
+
+    def feed(self, line: str) -> None:
+        if line.startswith((".", "'")):
+            if line[1:2] in ('"', "\\") or line.strip() in (".", "'"):
+                return  # comment or empty request
+            macro, _, raw_args = line[1:].lstrip().partition(" ")
+            self.request(macro, raw_args)
+        else:
+            self.text(strip_escapes(line).strip() if not self.nofill else strip_escapes(line).rstrip())
+
+    def render(self) -> str:
+        self.flush()
+        return "\n".join(self.lines).strip()
+
+
+def _section_name(line: str) -> Optional[str]:
+    if line.startswith((".SH", ".Sh")) and line[3:4] in (" ", "\t"):
+        return " ".join(split_macro_args(strip_escapes(line[4:]))).upper()
+    return None
+
+
+@lru_cache(maxsize=128)
+def _section_index(path: str, mtime_ns: int) -> Dict[str, int]:
+    # Section name -> line number of its heading, built by a cheap scan that
+    # never renders anything.
+    index: Dict[str, int] = {}
+    for number, line in enumerate(iter_roff_lines(path)):
+        name = _section_name(line)
+        if name and name not in index:
+            index[name] = number
+    return index
+
+
+@lru_cache(maxsize=128)
+def _render_section(path: str, mtime_ns: int, name: str) -> str:
+    start = _section_index(path, mtime_ns)[name]
+    renderer = _Renderer()
+    for number, line in enumerate(iter_roff_lines(path)):
+        if number < start:
+            # Keep the page name for mdoc `.Nm` references in later sections.
+            if line.startswith(".Nm ") and not renderer.name:
+                renderer.name = line[4:].split()[0]
+            continue
+        if number > start and _section_name(line):
+            break
+        renderer.feed(line)
+    return renderer.render()
+
+
+class ManPage:
+    """
+    A man page read straight from disk. Sections are indexed lazily and
+    rendered one at a time, so only the section asked for is converted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def find(cls, command: str) -> Optional["ManPage"]:
+        """Finds the page for a tool or a `tool subcommand` pair (e.g. git-commit)."""
+        names = ["-".join(command.split()), command.split()[0]] if " " in command.strip() else [command.strip()]
+        for name in names:
+            path = find_man_page(name)
+            if path:
+                return cls(path)
+        return None
+
+    def _mtime(self) -> int:
+        return os.stat(self.path).st_mtime_ns
+
+    def section_names(self) -> List[str]:
+        return list(_section_index(self.path, self._mtime()))
+
+    def section(self, name: str) -> Optional[str]:
+        """Returns the plain text of a section, trying common alternatives for it."""
+        available = _section_index(self.path, self._mtime())
+        for candidate in [name.upper()] + SECTION_FALLBACKS.get(name.upper(), []):
+            if candidate in available:
+                return _render_section(self.path, self._mtime(), candidate)
+        return None
+
+
+def _subcommand_pages(page_path: str, tool: str) -> List[str]:
+    # Tools such as git document each subcommand in its own `tool-sub` page.
+    pattern = os.path.join(os.path.dirname(page_path), f"{glob.escape(tool)}-*")
+    names = {os.path.basename(path).split(".")[0][len(tool) + 1:] for path in glob.glob(pattern)}
+    return sorted(name for name in names if name)
+
+
+def man_page_lookup(command: str) -> Optional[str]:
+    """
+    Help lookup for the command validator backed by the SYNOPSIS and OPTIONS
+    sections of a man page. For a bare tool, sibling `tool-sub` pages are
+    listed as subcommands so the validator can resolve them. An unreadable
+    page (a dangling link, a corrupt archive) counts as no documentation.
+    """
+    try:
+        page = ManPage.find(command)
+        if page is None:
+            return None
+        options = page.section("OPTIONS")
+        if not options:
+            return None
+        text = f"{page.section('SYNOPSIS') or ''}\n{options}"
+    except READ_ERRORS as e:
+        logger.warning(f"Could not read the man page for '{command}': {e}")
+        return None
+    if " " not in command.strip():
+        subcommands = _subcommand_pages(page.path, command.strip())
+        if subcommands:
+            text += "\nCOMMANDS\n" + "\n".join(f"  {name}  see {command.strip()}-{name}" for name in subcommands)
+    return text
+
+
+async def aman_page_lookup(command: str) -> Optional[str]:
+    """Async version of `man_page_lookup`; the glob and decompression run in a thread."""
+    return await asyncio.to_thread(man_page_lookup, command)
+
+
+class ManPageInput(BaseModel):
+    """Input for the man page tool."""
+    command: str = Field(description="The command-line tool to read the manual for, e.g. 'tar' or 'git commit'.")
+    section: str = Field(
+        default="OPTIONS",
+        description="The manual section to read, e.g. 'OPTIONS', 'EXAMPLES', 'SYNOPSIS' or 'DESCRIPTION'."
+    )
+
+
+class ManPageTool(BaseTool):
+    """A tool to read one section of a locally installed man page."""
+    name: str = "man_page"
+    description: str = (
+        "Reads a single section of the installed manual page of a command-line tool. "
+        "Prefer this over command_help for tools with terse --help output, such as tar, rsync, find or ssh."
+    )
+    args_schema: Type[BaseModel] = ManPageInput
+
+    def _run(self, command: str, section: str = "OPTIONS") -> str:
+        """Use the tool synchronously."""
+        logger.info(f"Reading man page section '{section}' for command: '{command}'")
+        try:
+            page = ManPage.find(command)
+            if page is None:
+                return f"Error: No manual page was found for '{command}'."
+            text = page.section(section)
+            if text is None:
+                return (
+                    f"Error: The manual page for '{command}' has no '{section}' section. "
+                    f"Available sections: {', '.join(page.section_names())}."
+                )
+        except READ_ERRORS as e:
+            logger.error(f"Could not read the man page for '{command}': {e}")
+            return f"Error: Could not read the manual page for '{command}': {e}"
+
+        if len(text) > MAX_SECTION_CHARS:
+            text = text[:MAX_SECTION_CHARS] + "\n[... section truncated ...]"
+        return text
+
+    async def _arun(self, command: str, section: str = "OPTIONS") -> str:
+        """Use the tool asynchronously."""
+        # Finding and decompressing the page would block the event loop.
+        return await asyncio.to_thread(self._run, command, section)
@@ -0,0 +1,251 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .common import aiz_home, tokenize
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = "path_index.json"
+
+# Everyday words that are also executables but rarely mean them ("rename a
+# file", "undo my last commit"). They never name a tool themselves, only
+# through an alias ("pr" -> gh). Words that are mostly used for their tool,
+# like "find", "sort" or "kill", are deliberately not listed.
+GENERIC_WORDS = {
+    "as", "at", "date", "env", "file", "free", "go", "id", "install", "join", "last",
+    "less", "link", "look", "make", "more", "nice", "open", "paste", "patch", "pr",
+    "print", "read", "script", "size", "sync", "test", "time", "top", "true", "false",
+    "type", "users", "watch", "which", "write", "yes",
+}
+
+# Query words that name a tool without spelling out its executable.
+# Candidates are listed in order of preference; only installed ones are used.
+TOOL_ALIASES: Dict[str, List[str]] = {
+    "kube": ["kubectl"],
+    "kubernetes": ["kubectl"],
+    "k8s": ["kubectl"],
+    "pod": ["kubectl"],
+    "pods": ["kubectl"],
+    "container": ["docker", "podman"],
+    "containers": ["docker", "podman"],
+    "compose": ["docker", "podman-compose"],
+    "github": ["gh", "git"],
+    "pr": ["gh"],
+    "repo": ["git"],
+    "commit": ["git"],
+    "branch": ["git"],
+    "postgres": ["psql"],
+    "postgresql": ["psql"],
+    "sqlite": ["sqlite3"],
+    "redis": ["redis-cli"],
+    "python": ["python3", "python"],
+    "pip": ["pip3", "pip"],
+    "javascript": ["node"],
+    "s3": ["aws"],
+    "gcp": ["gcloud"],
+    "azure": ["az"],
+    "terraform": ["terraform", "tofu"],
+    "tarball": ["tar"],
+    "archive": ["tar", "zip"],
+    "compress": ["tar", "gzip", "zip"],
+    "extract": ["tar", "unzip"],
+    "json": ["jq"],
+    "yaml": ["yq"],
+    "ripgrep": ["rg"],
+    "grep": ["rg", "grep"],
+    "download": ["curl", "wget"],
+    "http": ["curl", "wget"],
+    "copy": ["cp", "rsync"],
+    "sync": ["rsync"],
+    "disk": ["df", "du"],
+    "space": ["df", "du"],
+    "process": ["ps"],
+    "processes": ["ps"],
+    "port": ["ss", "lsof", "netstat"],
+    "ports": ["ss", "lsof", "netstat"],
+    "service": ["systemctl"],
+    "services": ["systemctl"],
+    "logs": ["journalctl"],
+    "cron": ["crontab"],
+    "video": ["ffmpeg"],
+    "audio": ["ffmpeg"],
+    "image": ["convert", "magick"],
+    "images": ["convert", "magick"],
+}
+
+# Match strengths, strongest first.
+EXACT_MATCH = 2
+ALIAS_MATCH = 1
+
+
+def _scan_directory(directory: str) -> List[str]:
+    names = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return names
+
+
+class PathIndex:
+    """
+    The executables on PATH, cached per directory and persisted between runs.
+
+    A directory is rescanned only when its mtime changes, which happens
+    whenever an entry is added, removed or renamed, so checking the index is
+    one stat per PATH directory. Permission changes on existing files do not
+    touch the directory and are only noticed on the next rescan.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, path: Optional[str] = None):
+        """
+        Args:
+            directory: Where the index is persisted. Defaults to $AIZ_HOME or ~/.aiz.
+            path: The search path to index. Defaults to $PATH at lookup time.
+        """
+        self.directory = Path(directory) if directory else aiz_home()
+        self.index_path = self.directory / INDEX_FILENAME
+        self.path = path
+        self._lock = threading.Lock()
+        self._directories: Dict[str, Tuple[int, List[str]]] = {}
+        self._loaded = False
+        self._key: Optional[tuple] = None
+        self._executables: Dict[str, str] = {}
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.index_path.read_text())
+            if data.get("format") == INDEX_FORMAT_VERSION:
+                self._directories = {
+                    directory: (mtime_ns, names) for directory, (mtime_ns, names) in data["directories"].items()
+                }
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable PATH index, rebuilding: {e}")
+            self._directories = {}
+
+    def _save(self) -> None:
+        data = {
+            "format": INDEX_FORMAT_VERSION,
+            "directories": {directory: [mtime_ns, names] for directory, (mtime_ns, names) in self._directories.items()},
+        }
+        temporary = self.index_path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(temporary, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not write PATH index: {e}")
+
+    def _refresh(self) -> None:
+        search_path = self.path if self.path is not None else os.environ.get("PATH", "")
+        directories = []
+        for directory in search_path.split(os.pathsep):
+            if directory and directory not in directories:
+                directories.append(directory)
+
+        key = []
+        changed = False
+        for directory in directories:
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            key.append((directory, mtime_ns))
+            cached = self._directories.get(directory)
+            if cached is None or cached[0] != mtime_ns:
+                self._directories[directory] = (mtime_ns, _scan_directory(directory))
+                changed = True
+
+        key = tuple(key)
+        if key == self._key:
+            return
+        self._key = key
+        if changed:
+            self._save()
+
+        # The first directory on PATH that has a name wins, as in the shell.
+        executables: Dict[str, str] = {}
+        for directory, _ in key:
+            for name in self._directories[directory][1]:
+                executables.setdefault(name, os.path.join(directory, name))
+        self._executables = executables
+
+    def executables(self) -> Dict[str, str]:
+        """Maps every executable name on PATH to its full path."""
+        with self._lock:
+            self._load()
+            self._refresh()
+            return self._executables
+
+    def is_installed(self, tool: str) -> bool:
+        return tool in self.executables()
+
+
+def candidate_tools(query: str, index: Optional[PathIndex] = None) -> List[str]:
+    """
+    Returns the installed tools the query names, most likely first: tools
+    named outright, then tools implied by an alias. Ties keep query order.
+    Only whole words count, and GENERIC_WORDS only through an alias, so
+    every candidate is a tool the user actually asked for.
+    """
+    index = index if index is not None else default_path_index()
+    executables = index.executables()
+
+    scores: Dict[str, Tuple[int, int]] = {}
+
+    def offer(tool: str, strength: int, position: int) -> None:
+        if tool not in executables:
+            return
+        best = scores.get(tool)
+        if best is None or (-strength, position) < (-best[0], best[1]):
+            scores[tool] = (strength, position)
+
+    for position, token in enumerate(tokenize(query)):
+        if token in executables and token not in GENERIC_WORDS:
+            # Named outright; its aliases ("grep" -> rg) would only add noise.
+            offer(token, EXACT_MATCH, position)
+            continue
+        for tool in TOOL_ALIASES.get(token, []):
+            if tool in executables:
+                offer(tool, ALIAS_MATCH, position)
+                break
+
+    return sorted(scores, key=lambda tool: (-scores[tool][0], scores[tool][1]))
+
+
+def format_tool_hint(candidates: List[str]) -> Optional[str]:
+    """A note for the model naming the installed tools it should work with."""
+    if not candidates:
+        return None
+    listed = ", ".join(f"`{tool}`" for tool in candidates)
+    return (
+        f"Installed on this machine and relevant to the request: {listed}. "
+        f"The most likely target tool is `{candidates[0]}`. "
+        "Only build commands from tools that are installed; do not look up help for tools that are not."
+    )
+
+
+_default_index: List[PathIndex] = []
+
+
+def default_path_index() -> PathIndex:
+    """A process-wide index of $PATH persisted in $AIZ_HOME."""
+    if not _default_index:
+        _default_index.append(PathIndex())
+    return _default_index[0]
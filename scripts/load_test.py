@@ -0,0 +1,273 @@
+"""
+Load-tests the supervisor or generator graph against the local mock LLM
+server (scripts/mock_llm_server.py), ramping the number of concurrent
+sessions and reporting throughput, latency percentiles, memory growth and
+error rates per stage:
+
+    python scripts/load_test.py --graph supervisor --provider anthropic \\
+        --stages 50,100,250,500 --stage-seconds 30 --stream
+
+No credentials or network access are needed; every model call goes to the
+mock server.
+
+The mock model never proposes a `command_executor` call, so runs end at the
+validated command: the confirmation prompt, the command itself and the
+journal write are not exercised. Only the journal's few-shot lookups are.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from mock_llm_server import MockLLMServer, add_mock_arguments, mock_config_from_args
+
+from aiz.agents.cascade import CascadeStats
+from aiz.agents.command_generator import build_command_generation_agent
+from aiz.agents.supervisor import build_supervisor_agent, worker_initial_state
+from aiz.tools.command_journal import CommandJournal
+from langchain_core.messages import HumanMessage
+
+QUERIES = [
+    "list every file in this directory with its permissions",
+    "how much space does this folder take",
+    "show free disk space in human readable units",
+    "find all python files under the current directory",
+    "show hidden files too",
+    "which filesystems are almost full",
+]
+
+
+def provider_config(provider: str, url: str, max_concurrency: int) -> Dict[str, Any]:
+    """A provider configuration that sends every request to the mock server at `url`."""
+    if provider == "anthropic":
+        return {
+            "provider": "anthropic",
+            "model_id": "claude-3-haiku-20240307",
+            "api_key": "mock-key",
+            "base_url": url,
+            "temperature": 0.0,
+        }
+    if provider == "aws_bedrock":
+        # boto3 keeps 10 connections per client by default, which would make
+        # the client, not the graph, the bottleneck.
+        from botocore.config import Config
+
+        return {
+            "provider": "aws_bedrock",
+            "model_id": "anthropic.claude-3-haiku-20240307-v1:0",
+            "aws_access_key_id": "mock",
+            "aws_secret_access_key": "mock",
+            "region_name": "us-east-1",
+            "endpoint_url": url,
+            "config": Config(max_pool_connections=max_concurrency),
+            "temperature": 0.0,
+        }
+    if provider == "hedged":
+        return {
+            "provider": "hedged",
+            "model_id": "hedged",
+            "backends": [
+                provider_config("anthropic", url, max_concurrency),
+                provider_config("aws_bedrock", url, max_concurrency),
+            ],
+        }
+    raise ValueError(f"Unknown provider '{provider}'.")
+
+
+def rss_mb() -> float:
+    """Current resident memory of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def initial_state(graph: str, query: str) -> dict:
+    if graph == "generator":
+        return worker_initial_state(query)
+    return {"messages": [HumanMessage(content=query)], "user_query": query}
+
+
+async def run_session(app: Any, graph: str, query: str, stream: bool, session_id: str) -> Optional[float]:
+    """
+    Runs one session to completion. Returns the time to the first streamed
+    model token when streaming, otherwise None.
+    """
+    config = {"configurable": {"thread_id": session_id}}
+    state = initial_state(graph, query)
+    if not stream:
+        await app.ainvoke(state, config)
+        return None
+
+    # Consuming events makes the chat models stream their responses.
+    started = time.perf_counter()
+    first_token = None
+    async for event in app.astream_events(state, config, version="v2"):
+        if first_token is None and event["event"] == "on_chat_model_stream":
+            first_token = time.perf_counter() - started
+    return first_token
+
+
+async def run_stage(app: Any, graph: str, concurrency: int, duration_s: float, stream: bool) -> Dict[str, Any]:
+    """Runs `concurrency` closed-loop sessions for `duration_s` and summarises them."""
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    errors: Dict[str, int] = {}
+    rss_before = rss_mb()
+    deadline = time.monotonic() + duration_s
+
+    async def worker(worker_id: int) -> None:
+        iteration = 0
+        while time.monotonic() < deadline:
+            query = QUERIES[(worker_id + iteration) % len(QUERIES)]
+            session_id = f"load-{concurrency}-{worker_id}-{iteration}"
+            iteration += 1
+            started = time.perf_counter()
+            try:
+                first_token = await run_session(app, graph, query, stream, session_id)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if first_token is not None:
+                first_tokens.append(first_token)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+
+    latencies.sort()
+    first_tokens.sort()
+    failed = sum(errors.values())
+    total = len(latencies) + failed
+    return {
+        "concurrency": concurrency,
+        "sessions": total,
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": errors,
+        "latency_p50_s": percentile(latencies, 0.50),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "latency_max_s": latencies[-1] if latencies else None,
+        "first_token_p50_s": percentile(first_tokens, 0.50),
+        "first_token_p95_s": percentile(first_tokens, 0.95),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def print_stage(result: Dict[str, Any]) -> None:
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.3f}s" if value is not None else "-"
+
+    print(
+        f"--- Stage {result['concurrency']:>4} sessions: "
+        f"{result['sessions']} runs, {result['throughput_per_s']}/s, "
+        f"p50 {seconds(result['latency_p50_s'])}, p95 {seconds(result['latency_p95_s'])}, "
+        f"p99 {seconds(result['latency_p99_s'])}, "
+        f"first token p95 {seconds(result['first_token_p95_s'])}, "
+        f"errors {result['error_rate']:.2%} {result['errors'] or ''}, "
+        f"RSS {result['rss_mb']}MB ({result['rss_growth_mb']:+}MB) ---"
+    )
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    stages = [int(stage) for stage in args.stages.split(",")]
+    if args.mock_url:
+        server, url = None, args.mock_url.rstrip("/")
+    else:
+        server = MockLLMServer(port=args.port, config=mock_config_from_args(args)).start()
+        url = server.url
+        print(f"--- Mock LLM server listening on {url} ---")
+
+    # Sync work (Bedrock calls, tool subprocesses) runs in the default
+    # executor; size it for the largest stage so it is not the limit tested.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(stages)))
+
+    config = provider_config(args.provider, url, max(stages))
+    cascade_stats = CascadeStats()
+    # A throwaway journal keeps few-shot examples from the real one out of the requests.
+    journal = CommandJournal(tempfile.mkdtemp(prefix="aiz-load-"))
+    if args.graph == "supervisor":
+        app = build_supervisor_agent(config, cascade_stats, journal)
+    else:
+        app = build_command_generation_agent(config, cascade_stats, journal)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    baseline_rss = rss_mb()
+    results = []
+    try:
+        for concurrency in stages:
+            # The agents print every step; at hundreds of sessions that output
+            # would cost more than the graphs themselves.
+            with open(os.devnull, "w") as devnull, contextlib.ExitStack() as quiet:
+                if not args.verbose:
+                    quiet.enter_context(contextlib.redirect_stdout(devnull))
+                result = await run_stage(app, args.graph, concurrency, args.stage_seconds, args.stream)
+            print_stage(result)
+            results.append(result)
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "graph": args.graph,
+        "provider": args.provider,
+        "stream": args.stream,
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "rss_growth_mb": round(rss_mb() - baseline_rss, 1),
+        "stages": results,
+        "mock_server": server.stats.report() if server is not None else None,
+        "cascade": cascade_stats.report(),
+    }
+    if server is not None:
+        print(f"--- Mock server: {report['mock_server']} ---")
+    print(f"--- Total RSS growth: {report['rss_growth_mb']:+}MB ---")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ramp concurrent aiz sessions against a mock LLM server.")
+    parser.add_argument("--graph", choices=["supervisor", "generator"], default="supervisor")
+    parser.add_argument("--provider", choices=["anthropic", "aws_bedrock", "hedged"], default="anthropic")
+    parser.add_argument("--stages", default="10,50,100,250,500",
+                        help="Comma-separated concurrency levels, run in order.")
+    parser.add_argument("--stage-seconds", type=float, default=30.0)
+    parser.add_argument("--stream", action="store_true", help="Stream model responses and report time to first token.")
+    parser.add_argument("--port", type=int, default=0, help="Mock server port (0 picks a free one).")
+    parser.add_argument("--mock-url", help="Use a mock server already running in another process "
+                                           "(so it does not compete with the graphs for CPU); the mock options are then ignored.")
+    parser.add_argument("--json", help="Also write the full report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agents' step-by-step output and INFO logs.")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=2)
@@ -0,0 +1,479 @@
+"""
+A local mock LLM server for load testing. It speaks enough of the Anthropic
+Messages API and the Bedrock Converse API (including tool use and streaming)
+for ChatAnthropic and ChatBedrockConverse to talk to it unmodified:
+
+    python scripts/mock_llm_server.py --port 8089 --latency-median 0.6
+
+Point a provider config at it with "base_url" (anthropic) or "endpoint_url"
+(aws_bedrock). Answers are scripted from the tools offered in the request, so
+both the supervisor and the generator graphs run end to end.
+"""
+import json
+import math
+import time
+import uuid
+import random
+import struct
+import sys
+import zlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+# Each scripted session asks for help on a tool, then answers with a command
+# that passes the validator against that tool's real --help output.
+SCRIPTED_COMMANDS = [
+    ("ls", "ls -la"),
+    ("du", "du -sh ."),
+    ("df", "df -h"),
+    ("find", "find . -type f -name '*.py'"),
+]
+# Roughly what a tokenizer would produce; only used for usage numbers and
+# streaming chunk sizes.
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class MockConfig:
+    """
+    Latency and failure behaviour of the mock server.
+
+    Time to first token is log-normally distributed around `latency_median_s`
+    (a sigma of 0 makes it fixed); every further output token adds
+    `token_interval_s`, streamed or not.
+    """
+    latency_median_s: float = 0.5
+    latency_sigma: float = 0.5
+    token_interval_s: float = 0.01
+    # Fraction of requests answered with a throttling error at random.
+    throttle_rate: float = 0.0
+    # Requests beyond this many in flight are throttled, like a quota. 0 = no limit.
+    max_inflight: int = 0
+    retry_after_s: float = 1.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockStats:
+    """Server-side counters, safe to read while the server runs."""
+    requests: Dict[str, int] = field(default_factory=dict)
+    streamed: int = 0
+    tool_use: int = 0
+    throttled: int = 0
+    # Clients that hung up mid-response, e.g. a hedged request that lost.
+    disconnected: int = 0
+    inflight: int = 0
+    peak_inflight: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "streamed": self.streamed,
+                "tool_use": self.tool_use,
+                "throttled": self.throttled,
+                "disconnected": self.disconnected,
+                "peak_inflight": self.peak_inflight,
+            }
+
+
+def _scripted_command(text: str) -> Tuple[str, str]:
+    return SCRIPTED_COMMANDS[zlib.crc32(text.encode("utf-8")) % len(SCRIPTED_COMMANDS)]
+
+
+def _tool_arguments(schema: Dict[str, Any], tool: str, user_text: str) -> Dict[str, Any]:
+    """Fills a tool's input schema: 'command' gets the scripted tool, other strings the user's text."""
+    arguments = {}
+    for name, spec in (schema.get("properties") or {}).items():
+        if spec.get("type", "string") != "string":
+            continue
+        arguments[name] = tool if name == "command" else user_text
+    return arguments
+
+
+def plan_reply(tools: List[Tuple[str, Dict[str, Any]]], user_text: str, after_tool_result: bool) -> Dict[str, Any]:
+    """
+    Decides the scripted reply. Returns {"tool": (name, id, arguments)} for a
+    tool call or {"text": ...} for a final answer.
+
+    The supervisor (offered the generator specialist) delegates once and then
+    finishes without asking to execute anything, so no confirmation prompt can
+    block a session. The generator asks for help once, then answers.
+    """
+    tool, command = _scripted_command(user_text)
+    names = {name: schema for name, schema in tools}
+    tool_id = f"toolu_{uuid.uuid4().hex[:24]}"
+    if not after_tool_result:
+        for name in ("command_generator_specialist", "command_help"):
+            if name in names:
+                return {"tool": (name, tool_id, _tool_arguments(names[name], tool, user_text))}
+    if "command_generator_specialist" in names:
+        return {"text": f"The command for your request is: {command}"}
+    return {"text": command}
+
+
+def _text_of(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, dict):
+            parts.append(block.get("text") or "")
+    return "".join(parts)
+
+
+def _user_query(messages: List[Dict[str, Any]]) -> str:
+    """The latest user turn with text in it; tool results carry none."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            text = _text_of(message.get("content"))
+            if text:
+                return text
+    return ""
+
+
+def _chunks(text: str) -> List[str]:
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)] or [""]
+
+
+def _token_count(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _event_stream_message(event_type: str, payload: Dict[str, Any]) -> bytes:
+    """Encodes one message of the AWS event stream format used by converse-stream."""
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"), (":message-type", "event")):
+        name_bytes, value_bytes = name.encode("utf-8"), value.encode("utf-8")
+        headers += struct.pack(">B", len(name_bytes)) + name_bytes + struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    body = json.dumps(payload).encode("utf-8")
+    prelude = struct.pack(">II", 16 + len(headers) + len(body), len(headers))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + headers + body
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockLLMServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        path = unquote(self.path.split("?", 1)[0])
+        if path == "/v1/messages":
+            api = "anthropic"
+        elif path.startswith("/model/") and path.endswith("/converse-stream"):
+            api = "bedrock_stream"
+        elif path.startswith("/model/") and path.endswith("/converse"):
+            api = "bedrock"
+        else:
+            self._send_json(404, {"message": f"Unknown path {path}"})
+            return
+
+        request = self._read_json()
+        server = self.server
+        if not server.admit(api):
+            if api == "anthropic":
+                self._send_json(
+                    429,
+                    {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited by mock server."}},
+                    {"retry-after": str(server.config.retry_after_s)},
+                )
+            else:
+                self._send_json(
+                    429,
+                    {"__type": "ThrottlingException", "message": "Too many requests, please wait before trying again."},
+                    {"x-amzn-ErrorType": "ThrottlingException"},
+                )
+            return
+        try:
+            if api == "anthropic":
+                self._anthropic(request)
+            else:
+                self._bedrock(request, stream=api == "bedrock_stream")
+        except (BrokenPipeError, ConnectionResetError):
+            server.count_disconnect()
+            self.close_connection = True
+        finally:
+            server.release()
+
+    def _anthropic(self, request: Dict[str, Any]) -> None:
+        messages = request.get("messages") or []
+        last = messages[-1] if messages else {}
+        content = last.get("content")
+        after_tool_result = isinstance(content, list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result" for block in content
+        )
+        user_text = _user_query(messages)
+        tools = [(tool["name"], tool.get("input_schema") or {}) for tool in request.get("tools") or []]
+        reply = plan_reply(tools, user_text, after_tool_result)
+        input_tokens = _token_count(json.dumps(request))
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        model = request.get("model", "mock")
+
+        if "tool" in reply:
+            name, tool_id, arguments = reply["tool"]
+            block = {"type": "tool_use", "id": tool_id, "name": name, "input": arguments}
+            streamed_text, stop_reason = json.dumps(arguments), "tool_use"
+            self.server.count_tool_use()
+        else:
+            block = {"type": "text", "text": reply["text"]}
+            streamed_text, stop_reason = reply["text"], "end_turn"
+        output_tokens = _token_count(streamed_text)
+
+        self.server.wait_first_token()
+        if not request.get("stream"):
+            self.server.wait_tokens(output_tokens)
+            self._send_json(200, {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [block],
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+            })
+            return
+
+        self.server.count_stream()
+        self._start_chunked("text/event-stream")
+
+        def event(kind: str, data: Dict[str, Any]) -> None:
+            self._write_chunk(f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n".encode("utf-8"))
+
+        event("message_start", {"message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+        }})
+        if block["type"] == "tool_use":
+            event("content_block_start", {"index": 0, "content_block": {**block, "input": {}}})
+            delta_type, delta_key = "input_json_delta", "partial_json"
+        else:
+            event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            delta_type, delta_key = "text_delta", "text"
+        for piece in _chunks(streamed_text):
+            event("content_block_delta", {"index": 0, "delta": {"type": delta_type, delta_key: piece}})
+            self.server.wait_tokens(1)
+        event("content_block_stop", {"index": 0})
+        event("message_delta", {"delta": {"stop_reason": stop_reason, "stop_sequence": None}, "usage": {"output_tokens": output_tokens}})
+        event("message_stop", {})
+        self._end_chunked()
+
+    def _bedrock(self, request: Dict[str, Any], stream: bool) -> None:
+        started = time.perf_counter()
+        messages = request.get("messages") or []
+        last = messages[-1] if messages else {}
+        after_tool_result = any("toolResult" in block for block in last.get("content") or [])
+        user_text = _user_query(messages)
+        tools = [
+            (tool["toolSpec"]["name"], (tool["toolSpec"].get("inputSchema") or {}).get("json") or {})
+            for tool in (request.get("toolConfig") or {}).get("tools") or []
+            if "toolSpec" in tool
+        ]
+        reply = plan_reply(tools, user_text, after_tool_result)
+        input_tokens = _token_count(json.dumps(request))
+
+        if "tool" in reply:
+            name, tool_id, arguments = reply["tool"]
+            block = {"toolUse": {"toolUseId": tool_id, "name": name, "input": arguments}}
+            streamed_text, stop_reason = json.dumps(arguments), "tool_use"
+            self.server.count_tool_use()
+        else:
+            block = {"text": reply["text"]}
+            streamed_text, stop_reason = reply["text"], "end_turn"
+        output_tokens = _token_count(streamed_text)
+        usage = {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": input_tokens + output_tokens}
+
+        self.server.wait_first_token()
+        if not stream:
+            self.server.wait_tokens(output_tokens)
+            self._send_json(200, {
+                "output": {"message": {"role": "assistant", "content": [block]}},
+                "stopReason": stop_reason,
+                "usage": usage,
+                "metrics": {"latencyMs": int((time.perf_counter() - started) * 1000)},
+            })
+            return
+
+        self.server.count_stream()
+        self._start_chunked("application/vnd.amazon.eventstream")
+
+        def event(kind: str, payload: Dict[str, Any]) -> None:
+            self._write_chunk(_event_stream_message(kind, payload))
+
+        event("messageStart", {"role": "assistant"})
+        if "toolUse" in block:
+            event("contentBlockStart", {"contentBlockIndex": 0, "start": {"toolUse": {"toolUseId": tool_id, "name": name}}})
+        for piece in _chunks(streamed_text):
+            delta = {"toolUse": {"input": piece}} if "toolUse" in block else {"text": piece}
+            event("contentBlockDelta", {"contentBlockIndex": 0, "delta": delta})
+            self.server.wait_tokens(1)
+        event("contentBlockStop", {"contentBlockIndex": 0})
+        event("messageStop", {"stopReason": stop_reason})
+        event("metadata", {"usage": usage, "metrics": {"latencyMs": int((time.perf_counter() - started) * 1000)}})
+        self._end_chunked()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server answering Anthropic Messages and Bedrock Converse
+    requests. Use `start()` to serve from a background thread.
+    """
+    daemon_threads = True
+    # Hundreds of sessions connect at once when a load stage starts.
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[MockConfig] = None):
+        super().__init__((host, port), MockLLMHandler)
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self._random = random.Random(self.config.seed)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def admit(self, api: str) -> bool:
+        """Counts a request in, or returns False if it should be throttled."""
+        stats = self.stats
+        with stats._lock:
+            stats.requests[api] = stats.requests.get(api, 0) + 1
+            limited = self.config.max_inflight and stats.inflight >= self.config.max_inflight
+            if limited or self._random.random() < self.config.throttle_rate:
+                stats.throttled += 1
+                return False
+            stats.inflight += 1
+            stats.peak_inflight = max(stats.peak_inflight, stats.inflight)
+            return True
+
+    def release(self) -> None:
+        with self.stats._lock:
+            self.stats.inflight -= 1
+
+    def count_stream(self) -> None:
+        with self.stats._lock:
+            self.stats.streamed += 1
+
+    def count_disconnect(self) -> None:
+        with self.stats._lock:
+            self.stats.disconnected += 1
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients hang up mid-request all the time under load (a hedged
+        # request's loser is cancelled, a session times out); count them
+        # instead of printing a traceback for each.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            self.count_disconnect()
+            return
+        super().handle_error(request, client_address)
+
+    def count_tool_use(self) -> None:
+        with self.stats._lock:
+            self.stats.tool_use += 1
+
+    def wait_first_token(self) -> None:
+        config = self.config
+        if config.latency_sigma > 0:
+            delay = self._random.lognormvariate(math.log(config.latency_median_s), config.latency_sigma)
+        else:
+            delay = config.latency_median_s
+        time.sleep(delay)
+
+    def wait_tokens(self, count: int) -> None:
+        if self.config.token_interval_s > 0:
+            time.sleep(count * self.config.token_interval_s)
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the MockConfig options to a command line parser."""
+    defaults = MockConfig()
+    parser.add_argument("--latency-median", type=float, default=defaults.latency_median_s,
+                        help="Median time to first token, in seconds.")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma,
+                        help="Log-normal sigma of the time to first token (0 = fixed).")
+    parser.add_argument("--token-interval", type=float, default=defaults.token_interval_s,
+                        help="Seconds per output token.")
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate,
+                        help="Fraction of requests throttled at random.")
+    parser.add_argument("--max-inflight", type=int, default=defaults.max_inflight,
+                        help="Throttle requests beyond this many in flight (0 = unlimited).")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after_s,
+                        help="retry-after seconds sent with Anthropic throttling errors.")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_median_s=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        token_interval_s=args.token_interval,
+        throttle_rate=args.throttle_rate,
+        max_inflight=args.max_inflight,
+        retry_after_s=args.retry_after,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock Anthropic / Bedrock endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, mock_config_from_args(args))
+    print(f"--- Mock LLM server listening on {server.url} ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"--- Mock LLM server stats: {server.stats.report()} ---")
@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 import os
 
 from aiz.agents.supervisor import build_supervisor_agent
+from aiz.agents.cascade import CascadeStats
+from aiz.agents.budget import RunBudget
 from langchain_core.messages import HumanMessage
 
 load_dotenv()
@@ -24,7 +26,15 @@ async def run_supervisor_test():
         "temperature": 0.0,
     }
 
-    supervisor_runnable = build_supervisor_agent(aws_bedrock_config)
+    # Cheapest model first; Sonnet is only used when Haiku's answer fails a check.
+    model_tiers = [
+        aws_bedrock_config,
+        {**aws_bedrock_config, "model_id": "anthropic.claude-3-sonnet-20240229-v1:0", "max_tokens": 2048},
+    ]
+
+    cascade_stats = CascadeStats()
+    budget = RunBudget(max_llm_calls=8, max_tool_calls=6, max_input_tokens=60000, deadline_s=60)
+    supervisor_runnable = build_supervisor_agent(model_tiers, cascade_stats, budget=budget)
 
     user_query = "IN my currnet project i want to add changes commit and using gh create pr against main branch?"
 
@@ -51,9 +61,13 @@ async def run_supervisor_test():
     if final_state:
         final_answer = final_state['messages'][-1].content
         print(final_answer)
+        print(f"Budget usage: {final_state.get('budget_usage')}")
     else:
         print("Could not determine final state.")
 
+    print("\n--- Model Cascade Report ---")
+    print(cascade_stats.report())
+
 
 if __name__ == "__main__":
     asyncio.run(run_supervisor_test())
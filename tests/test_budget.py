@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+from aiz.agents.budget import RunBudget, start_usage, record_llm_call, usage_since
+from aiz.agents.cascade import ModelCascade
+from aiz.agents.supervisor import worker_initial_state, with_worker_usage
+
+
+def slow_model(seconds):
+    def answer(messages):
+        time.sleep(seconds)
+        return AIMessage(content="ls -la")
+
+    async def aanswer(messages):
+        await asyncio.sleep(seconds)
+        return AIMessage(content="ls -la")
+
+    return RunnableLambda(answer, afunc=aanswer)
+
+
+def test_worker_continues_the_supervisor_usage():
+    supervisor = record_llm_call(start_usage(None), 1, 100, 10, AIMessage(content="", tool_calls=[
+        {"name": "command_generator_specialist", "args": {"user_query": "list files"}, "id": "call-1"},
+    ]))
+    state = worker_initial_state("list files", supervisor)
+    assert state["budget_usage"] == supervisor
+    assert state["budget_usage"] is not supervisor
+
+    # The worker's limits see the supervisor's calls and clock.
+    assert RunBudget(max_llm_calls=1).exhausted(state["budget_usage"]) == "max_llm_calls"
+
+    worker = record_llm_call(start_usage(state["budget_usage"]), 2, 300, 20, AIMessage(content="ls -la"))
+    assert worker["started_at"] == supervisor["started_at"]
+    spent = usage_since(worker, supervisor)
+    assert (spent["llm_calls"], spent["input_tokens"], spent["output_tokens"]) == (2, 300, 20)
+
+
+def test_supervisor_adds_worker_usage_from_tool_artifacts():
+    usage = record_llm_call(start_usage(None), 1, 100, 10, AIMessage(content=""))
+    messages = [
+        AIMessage(content="", tool_calls=[
+            {"name": "command_generator_specialist", "args": {"user_query": "x"}, "id": "call-1"},
+        ]),
+        ToolMessage(content="ls -la", name="command_generator_specialist", tool_call_id="call-1",
+                    artifact={"llm_calls": 2, "input_tokens": 300, "output_tokens": 20, "tool_calls": 1, "exhausted": None}),
+    ]
+    usage = with_worker_usage(usage, messages)
+    assert (usage["llm_calls"], usage["input_tokens"], usage["tool_calls"]) == (3, 400, 1)
+
+
+def test_remaining_deadline():
+    usage = start_usage(None)
+    usage["started_at"] -= 2.0
+    assert RunBudget().remaining_s(usage) is None
+    assert RunBudget(deadline_s=5).remaining_s(usage) == pytest.approx(3.0, abs=0.1)
+    assert RunBudget(deadline_s=1).remaining_s(usage) == 0.0
+
+
+def test_cascade_call_is_cut_off_at_the_timeout():
+    cascade = ModelCascade([slow_model(0.5)])
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        cascade.invoke([("user", "list files")], timeout=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(cascade.ainvoke([("user", "list files")], timeout=0.05))
+    assert time.monotonic() - started < 0.4
+    assert ModelCascade([slow_model(0.0)]).invoke([("user", "list files")], timeout=1.0).response.content == "ls -la"
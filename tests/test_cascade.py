@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from aiz.agents.cascade import CascadeStats, ModelCascade, check_confidence, check_single_command
+
+
+def tier(content, calls, **kwargs):
+    """A fake model tier that always answers `content` and logs every call in `calls`."""
+    def answer(messages):
+        calls.append(content)
+        return AIMessage(content=content, **kwargs)
+
+    async def aanswer(messages):
+        return answer(messages)
+
+    return RunnableLambda(answer, afunc=aanswer)
+
+
+MESSAGES = [("user", "list all files")]
+
+
+def test_cheap_answer_that_passes_is_accepted():
+    calls = []
+    cascade = ModelCascade([tier("ls -a", calls), tier("ls -la", calls)], checks=[check_single_command])
+    result = cascade.invoke(MESSAGES)
+    assert (result.response.content, result.tier, result.llm_calls) == ("ls -a", 0, 1)
+    assert calls == ["ls -a"]
+
+
+def test_failing_cheap_answer_escalates():
+    calls = []
+    cascade = ModelCascade([tier("```ls -a```", calls), tier("ls -la", calls)], checks=[check_single_command])
+    result = asyncio.run(cascade.ainvoke(MESSAGES))
+    assert (result.response.content, result.tier, result.llm_calls) == ("ls -la", 1, 2)
+    assert calls == ["```ls -a```", "ls -la"]
+
+
+def test_last_tier_is_always_accepted():
+    calls = []
+    cascade = ModelCascade([tier("I think ls", calls), tier("I'm not sure", calls)], checks=[check_confidence])
+    result = cascade.invoke(MESSAGES)
+    assert (result.response.content, result.tier) == ("I'm not sure", 1)
+
+
+def test_token_usage_is_summed_over_tiers():
+    usage = {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+    cascade = ModelCascade(
+        [tier("", [], usage_metadata=usage), tier("ls", [], usage_metadata=usage)],
+        checks=[check_single_command],
+    )
+    result = cascade.invoke(MESSAGES)
+    assert (result.input_tokens, result.output_tokens) == (20, 4)
+
+
+def test_stats_report_escalation_rate_and_latency():
+    stats = CascadeStats()
+    cascade = ModelCascade([tier("```ls```", []), tier("ls", [])], checks=[check_single_command], stats=stats)
+    cascade.invoke(MESSAGES)
+    ModelCascade([tier("ls", []), tier("ls -l", [])], checks=[check_single_command], stats=stats).invoke(MESSAGES)
+
+    report = stats.report()
+    assert report["requests"] == 2
+    cheap, strong = report["tiers"]
+    assert (cheap["calls"], cheap["accepted"], cheap["escalated"], cheap["escalation_rate"]) == (2, 1, 1, 0.5)
+    assert (strong["calls"], strong["accepted"], strong["escalation_rate"]) == (1, 1, 0.0)
+    assert cheap["mean_latency_s"] >= 0.0
+
+
+def test_cascade_needs_a_tier():
+    with pytest.raises(ValueError):
+        ModelCascade([])
+
+
+@pytest.mark.parametrize("content, reason", [
+    ("ls -la", None),
+    ("", "empty answer"),
+    ("`ls -la`", "answer is wrapped in markdown"),
+    ("ls\nls -la", "answer spans multiple lines"),
+    ("echo 'unterminated", "answer is not a parseable shell command"),
+])
+def test_check_single_command(content, reason):
+    assert check_single_command(AIMessage(content=content), []) == reason
+
+
+def test_check_single_command_ignores_tool_calls():
+    call = {"name": "command_help", "args": {"command": "ls"}, "id": "call-1"}
+    assert check_single_command(AIMessage(content="", tool_calls=[call]), []) is None
+
+
+@pytest.mark.parametrize("message, reason", [
+    (AIMessage(content="ls -la"), None),
+    (AIMessage(content="I think ls -la"), "low confidence ('i think')"),
+    (AIMessage(content="ls -la", response_metadata={"stop_reason": "max_tokens"}), "response was truncated"),
+    (AIMessage(content="ls -la", response_metadata={"stopReason": "length"}), "response was truncated"),
+])
+def test_check_confidence(message, reason):
+    assert check_confidence(message, []) == reason
@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+
+from aiz.tools import command_executor, command_journal
+from aiz.tools.command_executor import CommandExecutorTool, request_from_state
+from aiz.tools.installed_tools import known_version
+from aiz.tools.command_journal import CommandJournal, IndexedCommand, format_examples
+from langchain_core.messages import HumanMessage, SystemMessage
+
+
+def record(journal, query, command, tool="ls", exit_status=0):
+    return journal.record(query=query, tool=tool, version=None, command=command, exit_status=exit_status, duration=0.1)
+
+
+def test_entries_without_a_query_are_not_indexed(tmp_path):
+    journal = CommandJournal(tmp_path)
+    record(journal, "", "ls -la")
+    record(journal, "   ", "ls -l")
+    assert journal.similar("ls") == []
+
+
+def test_format_examples_never_emits_an_empty_turn():
+    examples = [
+        IndexedCommand("ls", "ls -la", "", 1, 0.0),
+        IndexedCommand("ls", "", "list files", 1, 0.0),
+        IndexedCommand("ls", "ls -la", "list all files", 1, 0.0),
+    ]
+    assert format_examples(examples) == [("user", "list all files"), ("assistant", "ls -la")]
+
+
+def test_index_is_not_rewritten_on_every_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(command_journal, "INDEX_SAVE_EVERY", 3)
+    journal = CommandJournal(tmp_path)
+    record(journal, "list files", "ls")
+    record(journal, "list all files", "ls -a")
+    assert not journal.index_path.exists()
+    record(journal, "list files by size", "ls -S")
+    assert journal.index_path.exists()
+
+
+def test_unsaved_entries_survive_a_restart(tmp_path):
+    journal = CommandJournal(tmp_path)
+    record(journal, "list files by size", "ls -S")
+    reopened = CommandJournal(tmp_path)
+    assert [c.command for c in reopened.similar("files by size")] == ["ls -S"]
+
+    record(journal, "list hidden files", "ls -a")
+    journal.flush()
+    assert journal.index_path.exists()
+    assert CommandJournal(tmp_path).similar("hidden files")[0].command == "ls -a"
+
+
+def test_executor_falls_back_to_the_request_in_the_graph_state():
+    assert request_from_state(None) == ""
+    assert request_from_state({"user_query": "list files", "messages": []}) == "list files"
+    messages = [SystemMessage(content="You are a shell expert."), HumanMessage(content="show disk usage")]
+    assert request_from_state({"messages": messages}) == "show disk usage"
+
+
+def test_command_with_alternating_queries_is_posted_once_per_word(tmp_path):
+    journal = CommandJournal(tmp_path)
+    for index in range(5):
+        record(journal, "list files" if index % 2 == 0 else "show directory", "ls")
+    journal.flush()
+
+    reopened = CommandJournal(tmp_path)
+    reopened.similar("list")
+    for postings in (journal._postings, reopened._postings):
+        assert all(ids == [0] for ids in postings.values())
+        assert {"list", "files", "show", "directory"} <= set(postings)
+    assert [c.command for c in reopened.similar("list files show directory")] == ["ls"]
+
+
+def test_executor_records_path_qualified_programs_without_running_them(tmp_path, monkeypatch):
+    log = tmp_path / "ran.log"
+    script = tmp_path / "deploy.sh"
+    script.write_text(f'#!/bin/sh\necho "RAN $*" >> {log}\n')
+    script.chmod(0o755)
+    monkeypatch.chdir(tmp_path)
+
+    journal = CommandJournal(tmp_path / "aiz")
+    CommandExecutorTool(journal=journal)._record("deploy", "./deploy.sh production", 0, 0.0)
+    entry = json.loads((tmp_path / "aiz" / "journal.jsonl").read_text())
+    assert (entry["tool"], entry["version"]) == ("./deploy.sh", None)
+    assert not log.exists()
+
+
+def test_known_version_never_runs_the_tool(tmp_path, monkeypatch):
+    log = tmp_path / "ran.log"
+    tool = tmp_path / "mytool"
+    tool.write_bytes(b"\x7fELF" + b"\0" * 64)
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.setenv("AIZ_HOME", str(tmp_path / "aiz"))
+    assert known_version("mytool").startswith("build ")
+    assert known_version("./mytool") is None
+    assert known_version("missing-tool") is None
+
+
+def test_async_executor_runs_without_blocking_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(command_executor.Confirm, "ask", lambda *args, **kwargs: True)
+    journal = CommandJournal(tmp_path)
+    tool = CommandExecutorTool(journal=journal)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        outputs = await asyncio.gather(tool._arun("sleep 0.3; echo done", "wait then print"), tool._arun("exit 3"))
+        task.cancel()
+        return outputs, ticks
+
+    (output, failure), ticks = asyncio.run(run())
+    assert output == "done\n"
+    assert failure == "Error executing command:\n"
+    assert ticks >= 10
+    entries = [json.loads(line) for line in (tmp_path / "journal.jsonl").read_text().splitlines()]
+    assert sorted(entry["exit_status"] for entry in entries) == [0, 3]
+
+
+def test_async_executor_kills_commands_that_time_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(command_executor.Confirm, "ask", lambda *args, **kwargs: True)
+    monkeypatch.setattr(command_executor, "EXECUTION_TIMEOUT_S", 0.2)
+    journal = CommandJournal(tmp_path)
+    started = time.perf_counter()
+    output = asyncio.run(CommandExecutorTool(journal=journal)._arun("sleep 5", "wait"))
+    assert output == "Error: The command 'sleep 5' timed out."
+    assert time.perf_counter() - started < 2
+    assert json.loads((tmp_path / "journal.jsonl").read_text())["exit_status"] == 124
+
+
+def test_queries_are_tokenized_like_the_path_index(tmp_path):
+    journal = CommandJournal(tmp_path)
+    record(journal, "list the hidden files.", "ls -a")
+    record(journal, "compile main.cpp with g++", "g++ main.cpp", tool="g++")
+    assert [c.command for c in journal.similar("hidden files")] == ["ls -a"]
+    assert "g++" in journal._postings
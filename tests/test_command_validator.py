@@ -0,0 +1,270 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from aiz.agents.cascade import check_flags_in_help
+from aiz.tools import command_validator
+from aiz.tools.command_validator import CommandValidator, parse_help, split_segments, OPTIONAL_VALUE
+
+LS_HELP = """Usage: ls [OPTION]... [FILE]...
+  -a, --all                  do not ignore entries starting with .
+  -l                         use a long listing format
+"""
+
+GREP_HELP = """Usage: grep [OPTION]... PATTERNS [FILE]...
+  -i, --ignore-case         ignore case distinctions in patterns and data
+  -r, --recursive           like --directories=recurse
+"""
+
+MAKE_HELP = """Usage: make [options] [target] ...
+  -j [N], --jobs[=N]          Allow N jobs at once; infinite jobs with no arg.
+  -k, --keep-going            Keep going when some targets can't be made.
+"""
+
+SORT_HELP = """Usage: sort [OPTION]... [FILE]...
+  -r, --reverse               reverse the result of comparisons
+  -u, --unique              output only the first of an equal run
+"""
+
+TEE_HELP = """Usage: tee [OPTION]... [FILE]...
+  -a, --append              append to the given FILEs, do not overwrite
+"""
+
+# `git --help` only lists the common commands; checkout and stash are missing.
+GIT_HELP = """usage: git [-v | --version] [-h | --help] [-C <path>] [-c <name>=<value>]
+           [-p | --paginate | -P | --no-pager] [--bare]
+           <command> [<args>]
+
+These are common Git commands used in various situations:
+
+work on the current change (see also: git help everyday)
+   add       Add file contents to the index
+   restore   Restore working tree files
+
+grow, mark and tweak your common history
+   branch    List, create, or delete branches
+   commit    Record changes to the repository
+
+collaborate (see also: git help workflows)
+   fetch     Download objects and refs from another repository
+   push      Update remote refs along with associated objects
+"""
+
+GIT_CHECKOUT_HELP = """usage: git checkout [<options>] <branch>
+    -b <branch>           create and checkout a new branch
+    -q, --quiet           suppress progress reporting
+"""
+
+GIT_PUSH_HELP = """SYNOPSIS
+       git push [--all | --mirror | --tags] [-n | --dry-run] [-f | --force]
+                  [--force-with-lease[=<refname>[:<expect>]] [--force-if-includes]]
+                  [<repository> [<refspec>...]]
+
+OPTIONS
+--[no-]force-with-lease, --force-with-lease=<refname>, --force-with-lease=<refname>:<expect>
+    Usually, "git push" refuses to update a remote ref that is not an ancestor.
+"""
+
+CURL_HELP = """Usage: curl [options...] <url>
+ -d, --data <data>          HTTP POST data
+ -o, --output <file>        Write to file instead of stdout
+ -s, --silent               Silent mode
+ -v, --verbose              Make the operation more talkative
+
+This is not the full help, this menu is stripped into categories.
+Use "--help category" to get an overview of all categories.
+For all options use the manual or "--help all".
+"""
+
+TAR_HELP = """Usage: tar [OPTION...] [FILE]...
+  -x, --extract, --get       extract files from an archive
+  -f, --file=ARCHIVE         use archive file or device ARCHIVE
+      --keep-directory-symlink   preserve existing symlinks to directories when
+                             extracting
+  -H, --format=FORMAT        create archive of the given format
+
+ FORMAT is one of the following:
+
+    gnu                      GNU tar 1.13.x format
+    posix                    same as pax
+
+Valid arguments for the --quoting-style option are:
+
+  literal
+  c
+"""
+
+CP_HELP = """Usage: cp [OPTION]... SOURCE DEST
+      --backup[=CONTROL]       make a backup of each existing destination file
+
+The version control method may be selected via the --backup option or through
+the VERSION_CONTROL environment variable.  Here are the values:
+
+  none, off       never make backups (even if --backup is given)
+  simple, never   always make simple backups
+"""
+
+DD_HELP = """Usage: dd [OPERAND]...
+  --help     display this help and exit
+
+Each CONV symbol may be:
+
+  ascii     from EBCDIC to ASCII
+  sync      pad every input block with NULs to ibs-size
+"""
+
+HELP = {
+    "ls": LS_HELP,
+    "grep": GREP_HELP,
+    "make": MAKE_HELP,
+    "sort": SORT_HELP,
+    "tee": TEE_HELP,
+    "git": GIT_HELP,
+    "git checkout": GIT_CHECKOUT_HELP,
+    "git push": GIT_PUSH_HELP,
+    "curl": CURL_HELP,
+    "tar": TAR_HELP,
+    "cp": CP_HELP,
+    "dd": DD_HELP,
+}
+# Subcommands documented in their own `tool-sub` man page.
+MAN_PAGES = {"git-checkout"}
+
+
+def installed(tool):
+    return f"/usr/bin/{tool}" if tool in HELP else None
+
+
+def man_page(name):
+    return f"/usr/share/man/man1/{name}.1" if name in MAN_PAGES else None
+
+
+@pytest.fixture
+def validator(monkeypatch):
+    # Only the documented tools count as installed, so a redirect target
+    # mistaken for a program would be reported as missing.
+    monkeypatch.setattr(command_validator.shutil, "which", installed)
+    monkeypatch.setattr(command_validator, "find_man_page", man_page)
+    return CommandValidator(HELP.get)
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("ls -la > files.txt", [["ls", "-la"]]),
+    ("ls -la>>files.txt", [["ls", "-la"]]),
+    ("grep foo f 2>/dev/null", [["grep", "foo", "f"]]),
+    ("make 2>&1 | tee build.log", [["make"], ["tee", "build.log"]]),
+    ("sort < in.txt", [["sort"]]),
+    ("make &> build.log && ls", [["make"], ["ls"]]),
+    ("head -n 2 > out", [["head", "-n", "2"]]),
+    ("ls; sort -r & grep x || tee y", [["ls"], ["sort", "-r"], ["grep", "x"], ["tee", "y"]]),
+])
+def test_redirections_stay_in_their_segment(command, expected):
+    assert split_segments(command) == expected
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la > files.txt",
+    "grep foo f 2>/dev/null",
+    "make 2>&1 | tee build.log",
+    "sort < in.txt",
+])
+def test_redirect_targets_are_not_validated_as_programs(validator, command):
+    assert validator.validate(command) == []
+
+
+def test_undocumented_flag_before_redirect_is_still_reported(validator):
+    assert validator.validate("ls --bogus > out") == ["`--bogus` is not a documented option of `ls`."]
+
+
+def test_subcommand_missing_from_parent_help_is_looked_up(validator):
+    assert validator.validate("git checkout -b feature") == []
+    assert validator.validate("git checkout --bogus") == ["`--bogus` is not a documented option of `git checkout`."]
+
+
+def test_unknown_subcommand_without_help_skips_flag_checks(validator):
+    assert validator.validate("git stash push -m x") == []
+
+
+def test_nested_optional_value_is_optional():
+    assert parse_help(GIT_PUSH_HELP).options["--force-with-lease"] == OPTIONAL_VALUE
+
+
+def test_nested_optional_value_needs_no_argument(validator):
+    assert validator.validate("git push origin main --force-with-lease") == []
+
+
+def test_abridged_help_does_not_reject_unlisted_flags(validator):
+    assert parse_help(CURL_HELP).abridged
+    assert validator.validate("curl -sSL https://example.com -o out") == []
+    assert validator.validate("curl -o") == ["`-o` requires a value in `curl`."]
+
+
+def test_cascade_check_accepts_subcommand_flags_missing_from_parent_help():
+    messages = [
+        AIMessage(content="", tool_calls=[{"name": "command_help", "args": {"command": "git"}, "id": "call-1"}]),
+        ToolMessage(content=GIT_HELP, tool_call_id="call-1"),
+    ]
+    assert check_flags_in_help(AIMessage(content="git checkout -b feature"), messages) is None
+
+
+def test_avalidate_prefetches_each_needed_help_once(monkeypatch):
+    monkeypatch.setattr(command_validator.shutil, "which", installed)
+    monkeypatch.setattr(command_validator, "find_man_page", man_page)
+    fetched = []
+
+    async def lookup(command):
+        fetched.append(command)
+        return HELP.get(command)
+
+    validator = CommandValidator(lookup)
+    problems = asyncio.run(validator.avalidate("git -C repo checkout --bogus | grep -i main > out"))
+    assert problems == ["`--bogus` is not a documented option of `git checkout`."]
+    assert fetched == ["git", "git checkout", "grep"]
+
+
+def test_sync_validate_rejects_an_async_lookup():
+    async def lookup(command):
+        return HELP.get(command)
+
+    with pytest.raises(TypeError):
+        CommandValidator(lookup, check_installed=False).validate("ls -la")
+
+
+def test_command_listing_is_read_as_subcommands():
+    assert {"add", "commit", "push", "fetch"} <= parse_help(GIT_HELP).subcommands
+
+
+@pytest.mark.parametrize("help_text", [TAR_HELP, CP_HELP, DD_HELP])
+def test_value_lists_are_not_subcommands(help_text):
+    assert parse_help(help_text).subcommands == set()
+
+
+def test_only_real_subcommands_are_looked_up(monkeypatch):
+    monkeypatch.setattr(command_validator.shutil, "which", installed)
+    monkeypatch.setattr(command_validator, "find_man_page", man_page)
+    fetched = []
+
+    def lookup(command):
+        fetched.append(command)
+        return HELP.get(command)
+
+    validator = CommandValidator(lookup)
+    assert validator.validate("tar xf a.tar") == []
+    assert validator.validate("git stash push -m x") == []
+    assert validator.validate("git commit -m x") == []
+    assert fetched == ["tar", "git", "git commit"]
+
+
+def test_path_qualified_programs_are_never_run_for_help(tmp_path, monkeypatch):
+    log = tmp_path / "ran.log"
+    script = tmp_path / "deploy.sh"
+    script.write_text(f'#!/bin/sh\necho "RAN $*" >> {log}\n')
+    script.chmod(0o755)
+    monkeypatch.chdir(tmp_path)
+
+    assert command_validator.live_help_lookup("./deploy.sh") is None
+    assert command_validator.live_help_lookup(str(script)) is None
+    assert CommandValidator().validate("./deploy.sh production") == []
+    assert asyncio.run(CommandValidator(command_validator.alive_help_lookup).avalidate("./deploy.sh production")) == []
+    assert not log.exists()
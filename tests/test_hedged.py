@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from aiz.providers.hedged import HedgedChatRunnable
+
+
+class FakeBackend:
+    """Streams `text` after `first_token_s`, optionally failing `fail_after_s` later."""
+
+    def __init__(self, text, first_token_s=0.0, fail_after_s=None):
+        self.text = text
+        self.first_token_s = first_token_s
+        self.fail_after_s = fail_after_s
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return AIMessage(content=self.text)
+
+    async def astream(self, input, config=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.first_token_s)
+        yield AIMessageChunk(content=self.text)
+        if self.fail_after_s is not None:
+            await asyncio.sleep(self.fail_after_s)
+            raise ConnectionError("stream reset")
+
+
+def hedged(*backends):
+    return HedgedChatRunnable(backends, [f"backend-{i}" for i in range(len(backends))], initial_hedge_delay_s=0.01)
+
+
+def test_cancelled_hedge_is_used_when_the_winner_fails_mid_stream():
+    primary = FakeBackend("ls -la", first_token_s=0.05, fail_after_s=0.05)
+    secondary = FakeBackend("ls -l", first_token_s=0.2)
+    model = hedged(primary, secondary)
+
+    response = asyncio.run(model.ainvoke("list files"))
+
+    assert response.content == "ls -l"
+    assert secondary.calls == 2
+    primary_stats, secondary_stats = model.stats
+    assert (primary_stats.errors, secondary_stats.cancelled, secondary_stats.wins) == (1, 1, 1)
+
+
+def test_failure_without_alternatives_is_raised():
+    model = hedged(FakeBackend("a", fail_after_s=0.0), FakeBackend("b", fail_after_s=0.0))
+    with pytest.raises(ConnectionError):
+        asyncio.run(model.ainvoke("list files"))
+
+
+def test_sync_calls_do_not_feed_the_first_token_histogram():
+    model = hedged(FakeBackend("ls -la"), FakeBackend("ls -l"))
+    assert model.invoke("list files").content == "ls -la"
+    assert model.stats[0].response_time.total == 1
+    assert model.stats[0].first_token.total == 0
@@ -0,0 +1,129 @@
+import subprocess
+
+import pytest
+
+from aiz.tools import command_helper, help_bundle
+from aiz.tools.command_helper import CommandHelpTool
+from aiz.tools.help_bundle import HEADER, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, HelpBundle, HelpBundleError, tool_fingerprint
+
+MYTOOL_HELP = "Usage: mytool [OPTION]...\n  -v, --verbose   explain what is being done\n"
+
+
+@pytest.fixture
+def mytool(tmp_path, monkeypatch):
+    """An installed binary named `mytool`; its help is never expected to run."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    tool = bin_dir / "mytool"
+    tool.write_bytes(b"\x7fELF" + b"\0" * 64)
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    return tool
+
+
+@pytest.fixture
+def live_help(monkeypatch):
+    """Records the live lookups CommandHelpTool makes instead of running them."""
+    calls = []
+
+    def run(args, **kwargs):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0, stdout="live help\n", stderr="")
+
+    monkeypatch.setattr(command_helper.subprocess, "run", run)
+    return calls
+
+
+def entry(command, fingerprint, help_text=MYTOOL_HELP):
+    return {
+        "command": command,
+        "tool": command.split()[0],
+        "fingerprint": fingerprint,
+        "version": "mytool 1.0",
+        "help": help_text,
+    }
+
+
+def use_default_bundle(monkeypatch, path):
+    monkeypatch.setenv(help_bundle.BUNDLE_ENV_VAR, str(path))
+    monkeypatch.setattr(help_bundle, "_default_bundle", {})
+
+
+def test_round_trip(tmp_path, mytool):
+    path = tmp_path / "help.bundle"
+    fingerprint = tool_fingerprint("mytool")
+    written = HelpBundle.write(str(path), [
+        entry("mytool", fingerprint),
+        entry("mytool  sub", fingerprint, "Usage: mytool sub [-f]\n  -f   force\n"),
+    ])
+    assert written == 2
+
+    bundle = HelpBundle(str(path))
+    assert sorted(bundle.entries) == ["mytool", "mytool sub"]
+    assert bundle.entries["mytool"]["version"] == "mytool 1.0"
+    assert bundle.get("mytool") == MYTOOL_HELP
+    assert bundle.get("mytool sub") == "Usage: mytool sub [-f]\n  -f   force\n"
+    assert bundle.get("othertool") is None
+    bundle.close()
+
+
+def test_matching_bundle_is_served_without_a_subprocess(tmp_path, monkeypatch, mytool, live_help):
+    path = tmp_path / "help.bundle"
+    HelpBundle.write(str(path), [entry("mytool", tool_fingerprint("mytool"))])
+    use_default_bundle(monkeypatch, path)
+
+    assert CommandHelpTool()._run("mytool") == MYTOOL_HELP
+    assert live_help == []
+
+
+def test_fingerprint_mismatch_falls_back_to_live_lookup(tmp_path, monkeypatch, mytool, live_help):
+    path = tmp_path / "help.bundle"
+    HelpBundle.write(str(path), [entry("mytool", tool_fingerprint("mytool"))])
+    # An upgrade rewrites the binary after the bundle was made.
+    mytool.write_bytes(b"\x7fELF" + b"\1" * 64)
+    use_default_bundle(monkeypatch, path)
+
+    assert HelpBundle(str(path)).get("mytool") is None
+    assert CommandHelpTool()._run("mytool") == "live help\n"
+    assert live_help == [["mytool", "--help"]]
+
+
+def test_scripts_are_never_fingerprinted_or_bundled(tmp_path, monkeypatch, live_help):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    # A pyenv-style shim: the same bytes whichever version it launches.
+    shim = bin_dir / "mytool"
+    shim.write_text('#!/usr/bin/env bash\nexec pyenv exec "$0" "$@"\n')
+    shim.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+
+    assert tool_fingerprint("mytool") is None
+    path = tmp_path / "help.bundle"
+    assert HelpBundle.export(str(path), ["mytool"]) == 0
+    assert live_help == []
+
+
+def header(magic=BUNDLE_MAGIC, version=BUNDLE_FORMAT_VERSION, count=0, index=b"[]"):
+    return HEADER.pack(magic, version, 0, count, HEADER.size, len(index)) + index
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"AIZ", "too small"),
+    (header(magic=b"NOTHELP\0"), "not a help bundle"),
+    (header(version=BUNDLE_FORMAT_VERSION + 1), f"bundle format {BUNDLE_FORMAT_VERSION + 1}"),
+    (header(count=3), "expected 3 entries, found 0"),
+])
+def test_unreadable_bundles_are_rejected(tmp_path, data, message):
+    path = tmp_path / "help.bundle"
+    path.write_bytes(data)
+    with pytest.raises(HelpBundleError, match=message):
+        HelpBundle(str(path))
+
+
+def test_unreadable_default_bundle_is_ignored(tmp_path, monkeypatch, mytool, live_help):
+    path = tmp_path / "help.bundle"
+    path.write_bytes(header(version=BUNDLE_FORMAT_VERSION + 1))
+    use_default_bundle(monkeypatch, path)
+
+    assert help_bundle.default_help_bundle() is None
+    assert CommandHelpTool()._run("mytool") == "live help\n"
@@ -0,0 +1,125 @@
+import gzip
+import lzma
+
+import pytest
+
+from aiz.tools.man_pages import ManPage, ManPageTool, find_man_page, man_page_lookup
+
+# man(7): the GNU and Linux manual pages.
+MYTAR_PAGE = r""".TH MYTAR 1
+.SH NAME
+mytar \- an archiver
+.SH SYNOPSIS
+.B mytar
+[\fIOPTION\fR...] [\fIFILE\fR]...
+.SH DESCRIPTION
+Creates archives.
+.SH OPTIONS
+.TP
+\fB\-f\fR, \fB\-\-file\fR=\fIARCHIVE\fR
+use archive file \(lqARCHIVE\(rq
+.TP
+.B \-v
+verbose
+.SH EXAMPLES
+.nf
+mytar -cf a.tar dir
+.fi
+"""
+
+# mdoc(7): the BSD and macOS manual pages, with options under DESCRIPTION.
+MYLS_PAGE = r""".Dd January 1, 2024
+.Dt MYLS 1
+.Os
+.Sh NAME
+.Nm myls
+.Nd list directory contents
+.Sh SYNOPSIS
+.Nm
+.Op Fl al
+.Op Ar file ...
+.Sh DESCRIPTION
+.Bl -tag -width Ds
+.It Fl a
+Include entries whose names begin with a dot.
+.It Fl l
+List in long format.
+.El
+"""
+
+MYTAR_OPTIONS = 'OPTIONS\n\n-f, --file=ARCHIVE\n       use archive file "ARCHIVE"\n\n-v\n       verbose'
+
+
+@pytest.fixture
+def man1(tmp_path, monkeypatch):
+    directory = tmp_path / "man1"
+    directory.mkdir()
+    with gzip.open(directory / "mytar.1.gz", "wt") as f:
+        f.write(MYTAR_PAGE)
+    with lzma.open(directory / "myls.1.xz", "wt") as f:
+        f.write(MYLS_PAGE)
+    # `.so` pages redirect to another page relative to the man root.
+    (directory / "mytar-create.1").write_text(".so man1/mytar.1\n")
+    monkeypatch.setenv("MANPATH", str(tmp_path))
+    return directory
+
+
+def test_find_man_page_follows_manpath(man1):
+    assert find_man_page("mytar") == str(man1 / "mytar.1.gz")
+    assert find_man_page("myls") == str(man1 / "myls.1.xz")
+    assert find_man_page("nosuchtool") is None
+
+
+def test_gzip_man_page_sections_are_indexed_and_rendered(man1):
+    page = ManPage.find("mytar")
+    assert page.section_names() == ["NAME", "SYNOPSIS", "DESCRIPTION", "OPTIONS", "EXAMPLES"]
+    assert page.section("options") == MYTAR_OPTIONS
+    assert page.section("EXAMPLES") == "EXAMPLES\nmytar -cf a.tar dir"
+    assert page.section("SEE ALSO") is None
+
+
+def test_xz_mdoc_page_falls_back_to_description_for_options(man1):
+    page = ManPage.find("myls")
+    assert page.section("SYNOPSIS") == "SYNOPSIS\nmyls [-al] [file ...]"
+    assert page.section("OPTIONS") == (
+        "DESCRIPTION\n\n-a\n       Include entries whose names begin with a dot.\n\n-l\n       List in long format."
+    )
+
+
+def test_so_redirect_renders_the_target_page(man1):
+    page = ManPage.find("mytar create")
+    assert page.path == str(man1 / "mytar-create.1")
+    assert page.section("OPTIONS") == MYTAR_OPTIONS
+
+
+def test_lookup_lists_subcommand_pages_for_a_bare_tool(man1):
+    assert man_page_lookup("mytar") == (
+        "SYNOPSIS\nmytar [OPTION...] [FILE]...\n" + MYTAR_OPTIONS + "\nCOMMANDS\n  create  see mytar-create"
+    )
+    assert "COMMANDS" not in man_page_lookup("mytar create")
+
+
+def test_lookup_without_options_section_returns_none(man1):
+    (man1 / "bare.1").write_text(".TH BARE 1\n.SH NAME\nbare \\- nothing\n")
+    assert man_page_lookup("bare") is None
+
+
+def test_so_redirect_to_a_missing_page_returns_none(man1):
+    (man1 / "ghost.1").write_text(".so man1/missing.1\n")
+    assert man_page_lookup("ghost") is None
+
+
+def test_dangling_link_returns_none(man1):
+    (man1 / "ghost.1.gz").symlink_to(man1 / "missing.1.gz")
+    assert man_page_lookup("ghost") is None
+    assert "Could not read" in ManPageTool()._run("ghost")
+
+
+@pytest.mark.parametrize("name, data", [
+    ("broken.1.gz", b"\x1f\x8b\x08\x00not really gzip"),
+    ("broken.1.xz", b"\xfd7zXZ\x00garbage"),
+    ("broken.1.gz", b"\x1f\x8b"),
+])
+def test_corrupt_page_returns_none(man1, name, data):
+    (man1 / name).write_bytes(data)
+    assert man_page_lookup("broken") is None
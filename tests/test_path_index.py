@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from aiz.tools.path_index import PathIndex, candidate_tools, format_tool_hint
+
+INSTALLED = ["find", "python", "python3", "git", "gh", "file", "last", "rename.ul", "count-14", "wc", "grep", "rg", "sort"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name in INSTALLED:
+        path = bin_dir / name
+        path.write_text("#!/bin/sh\n")
+        path.chmod(0o755)
+    return PathIndex(directory=tmp_path / "aiz", path=str(bin_dir))
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("open a pull request using gh create pr from my branch", ["gh", "git"]),
+    ("find all python files modified today", ["find", "python"]),
+    ("rename a file", []),
+    ("count lines in every python file", ["python"]),
+    ("undo my last commit", ["git"]),
+    ("grep for TODO in the sources", ["grep"]),
+    ("search json with ripgrep", ["rg"]),
+    ("sort the lines of a file", ["sort"]),
+])
+def test_only_named_and_aliased_tools_are_candidates(index, query, expected):
+    assert candidate_tools(query, index) == expected
+
+
+def test_hint_lists_only_the_candidates(index):
+    hint = format_tool_hint(candidate_tools("undo my last commit", index))
+    assert "`git`" in hint
+    assert "`last`" not in hint
+    assert format_tool_hint(candidate_tools("rename a file", index)) is None
+
+
+def test_index_picks_up_new_executables(index, tmp_path):
+    assert not index.is_installed("kubectl")
+    path = tmp_path / "bin" / "kubectl"
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    # Make sure the directory mtime changes even on coarse-grained filesystems.
+    stat = os.stat(tmp_path / "bin")
+    os.utime(tmp_path / "bin", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert candidate_tools("list kube pods", index) == ["kubectl"]